@@ -0,0 +1,129 @@
+from __future__ import annotations
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+
+from .box import Box
+
+
+class BaseDetections:
+    """
+    Detections of one frame, stored column-wise. Shared by hexss.image.detector and
+    hexss.image2.detector, which only differ in the per-box object (`_item`).
+
+    Attributes:
+        cls: (N,) class indices.
+        conf: (N,) confidence scores.
+        xyxy: (N, 4) boxes in pixel (x1, y1, x2, y2) format.
+        size: (W, H) of the source frame.
+        class_names: Class labels of the model.
+
+    `xywh`, `xywhn` and `xyxyn` are computed on first access. Filters return a new
+    object of the same type and never loop in Python:
+        dets.by_class('person'), dets[dets.conf >= 0.5], dets.inside(roi), dets.counts
+    Iterating (or indexing with an int) yields per-box objects, built once and cached.
+    """
+    __slots__ = ('cls', 'conf', 'xyxy', 'size', 'class_names', '_source', '_xywh', '_xywhn', '_xyxyn', '_items')
+
+    def __init__(
+            self,
+            cls: np.ndarray,
+            conf: np.ndarray,
+            xyxy: np.ndarray,
+            size: Tuple[int, int],
+            class_names: List[str],
+            source: Any = None
+    ) -> None:
+        self.cls = np.asarray(cls, dtype=int).reshape(-1)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        self.size = (int(size[0]), int(size[1]))
+        self.class_names = class_names
+        self._source = source
+        self._xywh: Optional[np.ndarray] = None
+        self._xywhn: Optional[np.ndarray] = None
+        self._xyxyn: Optional[np.ndarray] = None
+        self._items: List[Any] = [None] * len(self.cls)
+
+    @classmethod
+    def empty(cls, class_names: List[str], size: Tuple[int, int] = (1, 1)):
+        return cls(np.zeros(0, dtype=int), np.zeros(0), np.zeros((0, 4)), size, class_names)
+
+    # --------------------- coordinates ---------------------
+    @property
+    def xywh(self) -> np.ndarray:
+        if self._xywh is None:
+            xy1, xy2 = self.xyxy[:, :2], self.xyxy[:, 2:]
+            self._xywh = np.concatenate([(xy1 + xy2) / 2, xy2 - xy1], axis=1)
+        return self._xywh
+
+    @property
+    def xywhn(self) -> np.ndarray:
+        if self._xywhn is None:
+            self._xywhn = self.xywh / self._scale
+        return self._xywhn
+
+    @property
+    def xyxyn(self) -> np.ndarray:
+        if self._xyxyn is None:
+            self._xyxyn = self.xyxy / self._scale
+        return self._xyxyn
+
+    @property
+    def _scale(self) -> np.ndarray:
+        W, H = self.size
+        return np.array([W, H, W, H], dtype=np.float64)
+
+    # --------------------- filters ---------------------
+    @property
+    def names(self) -> List[str]:
+        return [self.class_names[i] for i in self.cls]
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Number of detections per class index, shape (len(class_names),)."""
+        return np.bincount(self.cls, minlength=len(self.class_names))
+
+    def by_class(self, *classes: Union[int, str]):
+        idx = [self.class_names.index(c) if isinstance(c, str) else int(c) for c in classes]
+        return self[np.isin(self.cls, idx)]
+
+    def inside(self, roi: Union[Box, Iterable[float]], full: bool = False):
+        """
+        Keep detections whose center (or whole box, with `full=True`) lies inside `roi`.
+        `roi` is a Box or a pixel (x1, y1, x2, y2).
+        """
+        if isinstance(roi, Box):
+            if roi.size is None:
+                roi.set_size(self.size)
+            roi = roi.xyxy
+        x1, y1, x2, y2 = np.asarray(roi, dtype=np.float64).reshape(4)
+        if full:
+            b = self.xyxy
+            mask = (b[:, 0] >= x1) & (b[:, 1] >= y1) & (b[:, 2] <= x2) & (b[:, 3] <= y2)
+        else:
+            c = self.xywh[:, :2]
+            mask = (c[:, 0] >= x1) & (c[:, 1] >= y1) & (c[:, 0] <= x2) & (c[:, 1] <= y2)
+        return self[mask]
+
+    # --------------------- sequence ---------------------
+    def _item(self, i: int) -> Any:
+        """Per-box object of detection `i`."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return len(self.cls)
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            i = range(len(self))[key]
+            if self._items[i] is None:
+                self._items[i] = self._item(i)
+            return self._items[i]
+        return type(self)(self.cls[key], self.conf[key], self.xyxy[key], self.size, self.class_names, self._source)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} n={len(self)} size={self.size[0]}x{self.size[1]}>"
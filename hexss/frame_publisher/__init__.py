@@ -1 +1,7 @@
-from .publisher import FramePublisher
\ No newline at end of file
+def __getattr__(name):
+    # imported on first use, so `hexss.frame_publisher.shm` (numpy only) does not pull in
+    # the publisher's OpenCV/Pillow requirements
+    if name == 'FramePublisher':
+        from .publisher import FramePublisher
+        return FramePublisher
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,10 +3,13 @@ import io
 import os
 import sys
 import time
+import threading
 import subprocess
 import webbrowser
+import socket
+import http.client
 from pathlib import Path
-from typing import Union
+from typing import Union, Optional, Dict, Tuple, Set
 from urllib import request as urlreq, parse as urlparse
 
 import hexss
@@ -39,6 +42,16 @@ def _encode_ndarray_to_jpeg(arr: np.ndarray, quality: int) -> bytes:
     return buf.tobytes()
 
 
+def _encode(source: SourceType, quality: int) -> Optional[bytes]:
+    if isinstance(source, np.ndarray):
+        return _encode_ndarray_to_jpeg(source, quality)
+    elif isinstance(source, PILImage.Image):
+        return _encode_pil_to_jpeg(source, quality)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    return None
+
+
 class FramePublisher:
     def __init__(
             self,
@@ -50,21 +63,61 @@ class FramePublisher:
             jpeg_quality: int = 80,
             open_browser: bool = False,
             unset_proxy: bool | None = None,
+            nonblocking: bool = False,
+            transport: str = "auto",
     ):
+        """
+        With `nonblocking=True`, `show()` only queues the frame and returns; a background
+        thread encodes and sends it. Each name keeps only its latest unsent frame, older
+        ones are dropped (see `stats`).
+
+        `transport`: "http" (JPEG over /push), "shm" (raw uint8 frames through a shared-memory
+        ring, see `shm.py`, announced to the server by a UDP datagram on the same port) or
+        "auto" (shm for ndarray frames when the server is on this host, http otherwise).
+        """
         if unset_proxy: from hexss.env import unset_proxy; unset_proxy()
         self.host = host
         self.port = int(port)
         self.jpeg_quality = int(max(1, min(100, jpeg_quality)))
+        self.is_local = host in ("0.0.0.0", "::", "localhost", "127.0.0.1")
         self.base_url = (
             f"http://127.0.0.1:{self.port}"
-            if host in ("0.0.0.0", "::", "localhost", "127.0.0.1")
+            if self.is_local
             else f"http://{host}:{self.port}"
         )
+        if transport not in ("auto", "http", "shm"):
+            raise ValueError(f"Unknown transport: {transport}")
+        self.transport = transport
+        self._rings: Dict[str, "ShmRingWriter"] = {}
+        self._shm_prefix = f"hxfp{os.getpid()}x{os.urandom(4).hex()}x"  # unique per instance
+        self._ring_count = 0
+        self._reattach: Set[str] = set()  # names the server asked about (it has no reader for them)
+        self._http_only: Set[str] = set()  # names whose /attach failed
+        self._shm_lock = threading.Lock()
+        self._doorbell: Optional[socket.socket] = None
+
+        # keep-alive connection to /push, shared by show() and the sender thread
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._conn_lock = threading.Lock()
+
+        self.nonblocking = nonblocking
+        self._pending: Dict[str, Tuple[SourceType, float]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {
+            "sent": 0, "dropped": 0, "errors": 0,
+            "encode_ms": 0.0, "send_ms": 0.0, "queue_ms": 0.0,  # moving averages
+        }
+        self._sender: Optional[threading.Thread] = None
 
         if autostart and not self._is_up():
             self._spawn_server(open_browser=open_browser)
             self._wait_until_up(timeout=wait_ready)
 
+        if nonblocking:
+            self._sender = threading.Thread(target=self._send_loop, name="FramePublisher-sender", daemon=True)
+            self._sender.start()
+
     def show(self, name: str, source: SourceType, *, timeout: float = 1.0) -> bool:
         """
         Encode `source` to JPEG bytes and POST to /push.
@@ -74,31 +127,199 @@ class FramePublisher:
           - PIL.Image.Image (any mode; encoded to JPEG)
           - bytes/bytearray/memoryview (assumed already JPEG)
 
-        Returns True on success, False otherwise.
+        Returns True on success, False otherwise. In nonblocking mode, returns True once
+        the frame is queued.
         """
-        try:
+        if self._use_shm(name, source):
+            try:
+                return self._show_shm(name, source)
+            except Exception as e:
+                print(e)
+                self._http_only.add(name)
+                with self._shm_lock:
+                    ring = self._rings.pop(name, None)
+                    if ring is not None:
+                        ring.close()
+
+        if self.nonblocking:
+            if not isinstance(source, (np.ndarray, PILImage.Image, bytes, bytearray, memoryview)):
+                return False
             if isinstance(source, np.ndarray):
-                data = _encode_ndarray_to_jpeg(source, self.jpeg_quality)
+                source = source.copy()  # the caller may reuse its buffer
             elif isinstance(source, PILImage.Image):
-                data = _encode_pil_to_jpeg(source, self.jpeg_quality)
-            elif isinstance(source, (bytes, bytearray, memoryview)):
-                data = bytes(source)
-            else:
-                return False
+                source = source.copy()
+            elif not isinstance(source, bytes):
+                source = bytes(source)
+            with self._cond:
+                if self._pending.pop(name, None) is not None:
+                    self._stats["dropped"] += 1
+                self._pending[name] = (source, time.perf_counter())
+                self._cond.notify()
+            return True
 
-            url = f"{self.base_url}/push?name={urlparse.quote(name)}"
-            req = urlreq.Request(url, data=data, headers={"Content-Type": "image/jpeg"}, method="POST")
-            with urlreq.urlopen(req, timeout=timeout) as r:
-                _ = r.read(1)
+        try:
+            t0 = time.perf_counter()
+            data = _encode(source, self.jpeg_quality)
+            if data is None:
+                return False
+            t1 = time.perf_counter()
+            self._post(name, data, timeout)
+            self._update_stats(t1 - t0, time.perf_counter() - t1, 0.0)
             return True
 
         except Exception as e:
+            with self._cond:
+                self._stats["errors"] += 1
             print(e)
             return False
 
     def publish(self, name: str, source: SourceType, *, timeout: float = 1.0) -> bool:
         return self.show(name, source, timeout=timeout)
 
+    @property
+    def stats(self) -> Dict[str, float]:
+        """
+        sent, dropped (replaced before being sent) and errors counters, frames waiting
+        to be sent, and moving averages of encode_ms, send_ms and queue_ms.
+        """
+        with self._cond:
+            return {**self._stats, "pending": len(self._pending)}
+
+    def close(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._sender is not None:
+            self._sender.join(timeout)
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        with self._shm_lock:
+            for ring in self._rings.values():
+                ring.close()
+            self._rings.clear()
+            if self._doorbell is not None:
+                self._doorbell.close()
+                self._doorbell = None
+
+    def _use_shm(self, name: str, source: SourceType) -> bool:
+        if self.transport == "http" or (self.transport == "auto" and not self.is_local):
+            return False
+        return (
+                name not in self._http_only
+                and isinstance(source, np.ndarray)
+                and source.dtype == np.uint8
+                and (source.ndim == 2 or (source.ndim == 3 and source.shape[2] in (1, 3, 4)))
+        )
+
+    def _show_shm(self, name: str, arr: np.ndarray) -> bool:
+        from hexss.frame_publisher.shm import ShmRingWriter
+
+        t0 = time.perf_counter()
+        with self._shm_lock:
+            self._read_doorbell_replies()
+            ring = self._rings.get(name)
+            if ring is None:
+                ring = ShmRingWriter(f"{self._shm_prefix}{self._ring_count}", capacity=arr.nbytes)
+                self._ring_count += 1
+                try:
+                    self._attach(name, ring)
+                except Exception:
+                    ring.close()
+                    raise
+                self._rings[name] = ring
+                if self._doorbell is None:
+                    self._doorbell = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    self._doorbell.setblocking(False)
+            elif name in self._reattach:  # e.g. the server restarted
+                self._attach(name, ring)
+            self._reattach.discard(name)
+            ring.write(arr)
+            t1 = time.perf_counter()
+            self._doorbell.sendto(name.encode("utf-8"), (urlparse.urlsplit(self.base_url).hostname, self.port))
+        self._update_stats(t1 - t0, time.perf_counter() - t1, 0.0)
+        return True
+
+    def _attach(self, name: str, ring: "ShmRingWriter") -> None:
+        self._request("POST", f"/attach?name={urlparse.quote(name)}&shm={urlparse.quote(ring.name)}")
+
+    def _read_doorbell_replies(self) -> None:
+        """The server answers a doorbell for a name it has no reader for with b'?' + name."""
+        while self._doorbell is not None:
+            try:
+                data = self._doorbell.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:  # e.g. ICMP port unreachable while the server is down
+                continue
+            if data[:1] == b"?":
+                self._reattach.add(data[1:].decode("utf-8", "replace"))
+
+    def __enter__(self) -> "FramePublisher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _update_stats(self, encode: float, send: float, queue: float, alpha: float = 0.1) -> None:
+        with self._cond:
+            st = self._stats
+            st["sent"] += 1
+            for key, value in (("encode_ms", encode), ("send_ms", send), ("queue_ms", queue)):
+                st[key] = value * 1000 if st["sent"] == 1 else st[key] + alpha * (value * 1000 - st[key])
+
+    def _post(self, name: str, data: bytes, timeout: float) -> None:
+        self._request("POST", f"/push?name={urlparse.quote(name)}", data, {"Content-Type": "image/jpeg"}, timeout)
+
+    def _request(
+            self,
+            method: str,
+            path: str,
+            data: Optional[bytes] = None,
+            headers: Optional[Dict[str, str]] = None,
+            timeout: float = 1.0
+    ) -> None:
+        url = urlparse.urlsplit(self.base_url)
+        with self._conn_lock:
+            for attempt in range(2):  # reconnect once if the kept-alive connection was closed
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection(url.hostname, url.port, timeout=timeout)
+                try:
+                    if self._conn.sock is not None:
+                        self._conn.sock.settimeout(timeout)
+                    self._conn.request(method, path, body=data, headers=headers or {})
+                    r = self._conn.getresponse()
+                    r.read()
+                    if r.status != 200:
+                        raise RuntimeError(f"{path.split('?')[0]} {r.status}")
+                    return
+                except (http.client.HTTPException, ConnectionError, OSError):
+                    self._conn.close()
+                    self._conn = None
+                    if attempt:
+                        raise
+
+    def _send_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                name = next(iter(self._pending))  # oldest name first
+                source, queued_at = self._pending.pop(name)
+            try:
+                t0 = time.perf_counter()
+                data = _encode(source, self.jpeg_quality)
+                t1 = time.perf_counter()
+                self._post(name, data, timeout=1.0)
+                self._update_stats(t1 - t0, time.perf_counter() - t1, t0 - queued_at)
+            except Exception as e:
+                with self._cond:
+                    self._stats["errors"] += 1
+                print(e)
+
     def _is_up(self) -> bool:
         try:
             with urlreq.urlopen(self.base_url + "/api/health", timeout=0.5):
@@ -1,11 +1,16 @@
 from __future__ import annotations
 import argparse
 import asyncio
+import bisect
+from collections import deque
+import io
 import json
-from dataclasses import dataclass
-from time import time
+import queue
+from dataclasses import dataclass, field
+from time import time, monotonic
 import threading
-from typing import Dict, Optional, Set
+from typing import Deque, Dict, List, Optional, Set, Tuple
+import zipfile
 
 import hexss
 
@@ -14,26 +19,201 @@ hexss.check_packages('fastapi', 'uvicorn', 'aiortc', 'av', 'opencv-python', 'num
 import numpy as np
 import cv2
 from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
+from aiortc.mediastreams import VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
 from av import VideoFrame
 from fastapi import FastAPI, Request, Query
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response
 import uvicorn
 
+try:
+    from .shm import ShmRingReader
+except ImportError:  # run as a script by FramePublisher
+    from shm import ShmRingReader
+
 
 @dataclass
 class _Entry:
-    rgb: np.ndarray
+    rgb: Optional[np.ndarray]  # None until decoded from `jpeg` (see _FrameStore.rgb)
     w: int
     h: int
     ts: float
+    seq: int = 0
+    jpeg: Optional[bytes] = None  # as received by /push, or encoded once on first request
+    renditions: Dict[tuple, "_Entry"] = field(default_factory=dict)  # (scale, roi) -> derived entry of this frame
+    # decode/encode of this frame, and one lock per rendition, so work on other frames never waits
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    rendition_locks: Dict[tuple, threading.Lock] = field(default_factory=dict, repr=False, compare=False)
+
+
+_REDUCED = {0.5: cv2.IMREAD_REDUCED_COLOR_2, 0.25: cv2.IMREAD_REDUCED_COLOR_4, 0.125: cv2.IMREAD_REDUCED_COLOR_8}
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(w, h) from the SOF segment of a JPEG without decoding it; None if `data` is not a JPEG."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i, n = 2, len(data)
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # no length
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            h = int.from_bytes(data[i + 5:i + 7], "big")
+            w = int.from_bytes(data[i + 7:i + 9], "big")
+            return (w, h) if w and h else None
+        if marker == 0xDA:  # start of scan before any SOF
+            return None
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def _rendition_key(scale: float = 1.0, roi: Optional[str] = None) -> Optional[tuple]:
+    """
+    Normalize query parameters: `scale` in (0, 1], `roi` as normalized "x1,y1,x2,y2".
+    None means the full frame.
+    """
+    scale = round(min(1.0, max(0.01, float(scale))), 3)
+    box = None
+    if roi:
+        x1, y1, x2, y2 = (min(1.0, max(0.0, float(v))) for v in roi.split(","))
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"empty roi: {roi}")
+        box = tuple(round(v, 4) for v in (x1, y1, x2, y2))
+        if box == (0.0, 0.0, 1.0, 1.0):
+            box = None
+    if scale == 1.0 and box is None:
+        return None
+    return scale, box
+
+
+class _History:
+    """
+    Recent JPEG frames per name as (seq, ts, jpeg). At most `frames` are kept per name and
+    at most `max_bytes` in total; the oldest frame of any name is dropped first. Frames
+    that arrive without JPEG bytes (shared-memory feeds) are encoded on a worker thread,
+    which drops frames when it falls behind.
+    """
+
+    def __init__(self, store: "_FrameStore", frames: int = 0, max_bytes: int = 256 * 1024 * 1024):
+        self.store = store
+        self.frames = int(frames)
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.dropped = 0
+        self._rings: Dict[str, Deque[Tuple[int, float, bytes]]] = {}
+        self._order: Deque[Tuple[str, Tuple[int, float, bytes]]] = deque()
+        self._lock = threading.Lock()
+        self._pending: Optional[queue.Queue] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.frames > 0 and self.max_bytes > 0
+
+    def record(self, name: str, entry: _Entry) -> None:
+        if not self.enabled:
+            return
+        if entry.jpeg is not None:
+            self._append(name, entry.seq, entry.ts, entry.jpeg)
+            return
+        if self._pending is None:
+            with self._lock:
+                if self._pending is None:
+                    self._pending = queue.Queue(maxsize=8)
+                    threading.Thread(target=self._encode_loop, daemon=True).start()
+        try:
+            self._pending.put_nowait((name, entry))
+        except queue.Full:
+            self.dropped += 1
+
+    def _encode_loop(self) -> None:
+        while True:
+            name, entry = self._pending.get()
+            try:
+                self._append(name, entry.seq, entry.ts, self.store.jpeg(entry))
+            except Exception:
+                self.dropped += 1
+
+    def _append(self, name: str, seq: int, ts: float, jpeg: bytes) -> None:
+        item = (seq, ts, jpeg)
+        with self._lock:
+            ring = self._rings.setdefault(name, deque())
+            ring.append(item)
+            self._order.append((name, item))
+            self.nbytes += len(jpeg)
+            if len(ring) > self.frames:
+                self.nbytes -= len(ring.popleft()[2])
+            while self.nbytes > self.max_bytes and self._order:
+                old_name, old = self._order.popleft()
+                old_ring = self._rings.get(old_name)
+                if old_ring and old_ring[0] is old:  # otherwise already dropped by the frame limit
+                    old_ring.popleft()
+                    self.nbytes -= len(old[2])
+                    if not old_ring:
+                        del self._rings[old_name]
+            if len(self._order) > 2 * sum(len(r) for r in self._rings.values()) + 64:
+                live = {id(it) for r in self._rings.values() for it in r}
+                self._order = deque(o for o in self._order if id(o[1]) in live)
+
+    def items(self, name: str, start: Optional[float] = None, end: Optional[float] = None) -> List[Tuple[int, float, bytes]]:
+        """Frames of `name` with `start <= ts <= end`, oldest first."""
+        with self._lock:
+            ring = list(self._rings.get(name, ()))
+        ts = [it[1] for it in ring]
+        lo = 0 if start is None else bisect.bisect_left(ts, start)
+        hi = len(ring) if end is None else bisect.bisect_right(ts, end)
+        return ring[lo:hi]
+
+    def at(self, name: str, ts: Optional[float] = None, seq: Optional[int] = None) -> Optional[Tuple[int, float, bytes]]:
+        """Frame with `seq`, or the last frame at or before `ts` (the oldest one if `ts` is earlier)."""
+        ring = self.items(name)
+        if not ring:
+            return None
+        if seq is not None:
+            return next((it for it in ring if it[0] == seq), None)
+        if ts is None:
+            return ring[-1]
+        i = bisect.bisect_right([it[1] for it in ring], ts)
+        return ring[max(0, i - 1)]
+
+    def summary(self) -> dict:
+        with self._lock:
+            names = {
+                n: {"count": len(r), "bytes": sum(len(it[2]) for it in r), "start": r[0][1], "end": r[-1][1]}
+                for n, r in self._rings.items()
+            }
+        return {"frames": self.frames, "max_bytes": self.max_bytes, "bytes": self.nbytes,
+                "dropped": self.dropped, "names": names}
 
 
 class _FrameStore:
+    """
+    Latest frame per name. Every put increments the name's `seq` and wakes the coroutines
+    waiting in `wait_newer`; registering a new name wakes `wait_names`. `put_bgr` and
+    `put_jpeg` may be called from any thread. Frames put as JPEG are decoded only when
+    something needs the pixels (`rgb`), at most once per frame.
+    """
+
     def __init__(self):
         self._store: Dict[str, _Entry] = {}
         self._lock = threading.Lock()
-
-    def put_bgr(self, name: str, img: np.ndarray):
+        self._events: Dict[str, asyncio.Event] = {}
+        self._names_event = asyncio.Event()
+        self.names_version = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.jpeg_quality = 80
+        self.history = _History(self)
+
+    def put_bgr(self, name: str, img: np.ndarray, jpeg: Optional[bytes] = None):
+        """Store a BGR/GRAY/BGRA frame; `jpeg` is its already encoded form, if any."""
         if img is None:
             return
         if img.ndim == 2:
@@ -42,8 +222,133 @@ class _FrameStore:
             img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
         rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         h, w = rgb.shape[:2]
+        self._put(name, rgb, w, h, jpeg)
+
+    def put_jpeg(self, name: str, jpeg: bytes) -> Optional[Tuple[int, int]]:
+        """
+        Store a JPEG frame without decoding it. Returns (w, h), or None if `jpeg` has no
+        readable size (not a JPEG), in which case nothing is stored.
+        """
+        size = _jpeg_size(jpeg)
+        if size is None:
+            return None
+        self._put(name, None, size[0], size[1], jpeg)
+        return size
+
+    def _put(self, name: str, rgb: Optional[np.ndarray], w: int, h: int, jpeg: Optional[bytes]) -> None:
         with self._lock:
-            self._store[name] = _Entry(rgb=rgb, w=w, h=h, ts=time())
+            old = self._store.get(name)
+            entry = _Entry(rgb=rgb, w=w, h=h, ts=time(), seq=old.seq + 1 if old else 1, jpeg=jpeg)
+            self._store[name] = entry
+            if old is None:
+                self.names_version += 1
+        self.history.record(name, entry)
+        self._notify(name, old is None)
+
+    def _notify(self, name: str, new_name: bool) -> None:
+        loop = self._loop
+        if loop is None:
+            return  # nobody has waited yet
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wake(name, new_name)
+        else:
+            loop.call_soon_threadsafe(self._wake, name, new_name)
+
+    def _wake(self, name: str, new_name: bool) -> None:
+        event = self._events.pop(name, None)
+        if event is not None:
+            event.set()
+        if new_name:
+            event, self._names_event = self._names_event, asyncio.Event()
+            event.set()
+
+    def rgb(self, entry: _Entry) -> np.ndarray:
+        """
+        RGB pixels of `entry`, decoded from its JPEG at most once per frame. A frame that
+        fails to decode becomes black. Blocking; call in a thread.
+        """
+        if entry.rgb is None:
+            with entry.lock:
+                if entry.rgb is None:
+                    bgr = cv2.imdecode(np.frombuffer(entry.jpeg, np.uint8), cv2.IMREAD_COLOR)
+                    if bgr is None:
+                        entry.rgb = np.zeros((entry.h, entry.w, 3), np.uint8)
+                    else:
+                        entry.rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        return entry.rgb
+
+    async def rgb_async(self, entry: _Entry) -> np.ndarray:
+        if entry.rgb is not None:
+            return entry.rgb
+        return await asyncio.to_thread(self.rgb, entry)
+
+    def jpeg(self, entry: _Entry) -> bytes:
+        """JPEG bytes of `entry`, encoded at most once per frame. Blocking; call in a thread."""
+        if entry.jpeg is None:
+            rgb = self.rgb(entry)
+            with entry.lock:
+                if entry.jpeg is None:
+                    bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+                    ok, buf = cv2.imencode(".jpg", bgr, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+                    if not ok:
+                        raise RuntimeError("cv2.imencode failed")
+                    entry.jpeg = buf.tobytes()
+        return entry.jpeg
+
+    async def jpeg_async(self, entry: _Entry) -> bytes:
+        if entry.jpeg is not None:
+            return entry.jpeg
+        return await asyncio.to_thread(self.jpeg, entry)
+
+    def rendition(self, entry: _Entry, key: Optional[tuple]) -> _Entry:
+        """
+        Downscaled and/or cropped version of `entry` for a `_rendition_key`, computed at most
+        once per frame and kept with the frame. A plain ½, ¼ or ⅛ downscale of a frame that is
+        not decoded yet uses the JPEG decoder's reduced mode. Blocking; call in a thread.
+        """
+        if key is None:
+            return entry
+        r = entry.renditions.get(key)
+        if r is not None:
+            return r
+        scale, box = key
+        with entry.rendition_locks.setdefault(key, threading.Lock()):
+            r = entry.renditions.get(key)
+            if r is not None:
+                return r
+            rgb = None
+            if box is None and entry.rgb is None and scale in _REDUCED:
+                bgr = cv2.imdecode(np.frombuffer(entry.jpeg, np.uint8), _REDUCED[scale])
+                if bgr is not None:
+                    w, h = max(2, round(entry.w * scale)) & ~1, max(2, round(entry.h * scale)) & ~1
+                    rgb = cv2.cvtColor(bgr[:h, :w], cv2.COLOR_BGR2RGB)  # the decoder rounds up
+            if rgb is None:
+                rgb = self.rgb(entry)
+                if box is not None:
+                    x1, y1, x2, y2 = box
+                    rgb = rgb[int(y1 * entry.h):max(int(y2 * entry.h), int(y1 * entry.h) + 1),
+                              int(x1 * entry.w):max(int(x2 * entry.w), int(x1 * entry.w) + 1)]
+                if scale != 1.0:
+                    h, w = rgb.shape[:2]
+                    size = (max(2, round(w * scale)) & ~1, max(2, round(h * scale)) & ~1)  # even, for the video encoder
+                    rgb = cv2.resize(rgb, size, interpolation=cv2.INTER_AREA)
+                else:
+                    rgb = np.ascontiguousarray(rgb)
+            r = _Entry(rgb=rgb, w=rgb.shape[1], h=rgb.shape[0], ts=entry.ts, seq=entry.seq)
+            entry.renditions[key] = r
+        return r
+
+    async def rendition_async(self, entry: _Entry, key: Optional[tuple]) -> _Entry:
+        if key is None:
+            return entry
+        r = entry.renditions.get(key)
+        if r is not None:
+            return r
+        return await asyncio.to_thread(self.rendition, entry, key)
 
     def latest(self, name: str) -> Optional[_Entry]:
         with self._lock:
@@ -53,20 +358,156 @@ class _FrameStore:
         with self._lock:
             return list(self._store.keys())
 
+    def alive_names(self, alive: Optional[float] = None) -> list[str]:
+        """Names that received a frame in the last `alive` seconds (all names if None)."""
+        now = time()
+        with self._lock:
+            return [n for n, e in self._store.items() if alive is None or now - e.ts <= alive]
+
+    async def wait_newer(self, name: str, seq: int, timeout: Optional[float] = None) -> Optional[_Entry]:
+        """
+        Latest entry of `name` once its seq is greater than `seq`, or the current (possibly
+        unchanged or None) entry after `timeout` seconds.
+        """
+        self._loop = asyncio.get_running_loop()
+        entry = self.latest(name)
+        if entry is not None and entry.seq > seq:
+            return entry
+        event = self._events.setdefault(name, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.latest(name)
+
+    async def wait_names(self, version: int, timeout: Optional[float] = None) -> int:
+        """Wait until a name is registered after `version` (or `timeout`); returns the current version."""
+        self._loop = asyncio.get_running_loop()
+        if self.names_version == version:
+            event = self._names_event
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.names_version
+
+
+class _ShmFeeds(asyncio.DatagramProtocol):
+    """
+    Frames published through shared-memory rings (see shm.py). A publisher registers a
+    ring with /attach, then sends the stream name as a UDP datagram to the server port
+    after each frame; the latest frame is copied out of the ring into the store on a
+    worker thread. A doorbell for an unknown name (e.g. after a server restart) is
+    answered with b'?' + name so the publisher attaches again.
+    """
+
+    def __init__(self, store: _FrameStore):
+        self.store = store
+        self.readers: Dict[str, ShmRingReader] = {}
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self._busy: Set[str] = set()  # names being read on a worker thread
+        self._again: Set[str] = set()  # names rung while busy
+
+    @property
+    def listening(self) -> bool:
+        """True while the UDP doorbell is bound; without it attached rings are never read."""
+        return self.transport is not None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def connection_lost(self, exc) -> None:
+        self.transport = None
+
+    def attach(self, name: str, segment: str) -> None:
+        old = self.readers.pop(name, None)
+        if old is not None and name not in self._busy:  # otherwise closed by _pulled
+            old.close()
+        self.readers[name] = ShmRingReader(segment)
+        self.pull(name)
+
+    def pull(self, name: str) -> bool:
+        """Read the latest frame of `name` off the event loop; False if `name` is not attached."""
+        reader = self.readers.get(name)
+        if reader is None:
+            return False
+        if name in self._busy:
+            self._again.add(name)
+            return True
+        self._busy.add(name)
+        future = asyncio.get_running_loop().run_in_executor(None, self._read, name, reader)
+        future.add_done_callback(lambda f: self._pulled(name, reader, f))
+        return True
+
+    def _read(self, name: str, reader: ShmRingReader) -> None:
+        frame = reader.read()
+        if frame is not None:
+            self.store.put_bgr(name, frame[2])  # copy and BGR->RGB on this worker thread
+
+    def _pulled(self, name: str, reader: ShmRingReader, future: asyncio.Future) -> None:
+        self._busy.discard(name)
+        current = self.readers.get(name) is reader
+        error = future.exception()
+        if isinstance(error, (FileNotFoundError, ValueError)):
+            if current:
+                self.readers.pop(name, None)  # publisher went away
+                current = False
+        elif error is not None:
+            print(f"shm {name}: {error!r}")
+        if not current:
+            reader.close()
+            self._again.discard(name)
+            if name in self.readers:  # re-attached meanwhile
+                self.pull(name)
+        elif name in self._again:
+            self._again.discard(name)
+            self.pull(name)
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if not self.pull(data.decode("utf-8", "replace")) and self.transport is not None:
+            self.transport.sendto(b"?" + data, addr)
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
+
 
 class _NamedTrack(VideoStreamTrack):
+    """
+    Sends a frame as soon as a new one is stored, at most `fps` per second. If nothing
+    arrives for `keepalive` seconds, the last frame is sent again.
+    """
     kind = "video"
 
-    def __init__(self, name: str, store: _FrameStore, fps: float = 30.0):
+    def __init__(
+            self,
+            name: str,
+            store: _FrameStore,
+            fps: float = 30.0,
+            keepalive: float = 1.0,
+            rendition: Optional[tuple] = None
+    ):
         super().__init__()
         self.name = name
         self.store = store
+        self.rendition = rendition
         self.frame_interval = 1.0 / max(1.0, float(fps))
+        self.keepalive = keepalive
+        self.last_seq = 0
+        self.last_sent = 0.0
+        self.t0: Optional[float] = None
 
     async def recv(self) -> VideoFrame:
-        await asyncio.sleep(self.frame_interval)
-        pts, time_base = await self.next_timestamp()
-        entry = self.store.latest(self.name)
+        entry = await self.store.wait_newer(self.name, self.last_seq, timeout=self.keepalive)
+        wait = self.frame_interval - (monotonic() - self.last_sent)
+        if wait > 0:  # fps cap; send whatever is latest after waiting
+            await asyncio.sleep(wait)
+            entry = self.store.latest(self.name)
+        self.last_sent = monotonic()
+
         if entry is None:
             h, w = 480, 640
             rgb = np.zeros((h, w, 3), np.uint8)
@@ -74,33 +515,65 @@ class _NamedTrack(VideoStreamTrack):
                         (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.2,
                         (255, 255, 255), 2, cv2.LINE_AA)
         else:
-            rgb = entry.rgb
+            rgb = await self.store.rgb_async(await self.store.rendition_async(entry, self.rendition))
+            self.last_seq = entry.seq
         vf = VideoFrame.from_ndarray(rgb, format="rgb24")
-        vf.pts = pts
-        vf.time_base = time_base
+        # pts from the wall clock: frames are sent irregularly, not at a fixed rate
+        if self.t0 is None:
+            self.t0 = self.last_sent
+        vf.pts = int((self.last_sent - self.t0) * VIDEO_CLOCK_RATE)
+        vf.time_base = VIDEO_TIME_BASE
         return vf
 
 
-def build_app(fps: float = 30.0) -> FastAPI:
+def build_app(
+        fps: float = 30.0,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        keepalive: float = 1.0,
+        history_frames: int = 0,
+        history_mb: float = 256.0
+) -> FastAPI:
+    """
+    `fps` caps the frame rate of each WebRTC track; `keepalive` is how often an unchanged
+    frame is re-sent. `host`/`port` enable the UDP doorbell of the shared-memory transport on the same
+    address as HTTP; without them /attach fails, so publishers fall back to /push.
+    `history_frames` > 0 keeps that many recent JPEGs per name, `history_mb` in total (/history/*).
+    """
     store = _FrameStore()
+    store.history.frames = history_frames
+    store.history.max_bytes = int(history_mb * 1024 * 1024)
+    shm_feeds = _ShmFeeds(store)
     pcs: Set[RTCPeerConnection] = set()
     app = FastAPI()
 
+    @app.on_event("startup")
+    async def start_doorbell():
+        if port is not None:
+            loop = asyncio.get_running_loop()
+            await loop.create_datagram_endpoint(lambda: shm_feeds, local_addr=(host or "0.0.0.0", port))
+
+    @app.on_event("shutdown")
+    async def stop_doorbell():
+        shm_feeds.close()
+
+    @app.post("/attach")
+    async def attach(name: str = Query(...), shm: str = Query(...)):
+        if not shm_feeds.listening:
+            return JSONResponse({"ok": False, "error": "shared-memory transport is not enabled"}, status_code=503)
+        try:
+            shm_feeds.attach(name, shm)
+        except (FileNotFoundError, ValueError) as e:
+            return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
+        return JSONResponse({"ok": True})
+
     @app.get("/api/health")
     async def api_health():
         return JSONResponse({"ok": True})
 
     @app.get("/api/names")
     async def api_names(alive: float | None = Query(None, description="seconds to consider alive")):
-        if alive is None:
-            return JSONResponse(store.names())
-        now = time()
-        out = []
-        for n in store.names():
-            e = store.latest(n)
-            if e and (now - e.ts) <= alive:
-                out.append(n)
-        return JSONResponse(out)
+        return JSONResponse(store.alive_names(alive))
 
     @app.get("/api/meta")
     async def api_meta(name: str = Query(...)):
@@ -108,7 +581,7 @@ def build_app(fps: float = 30.0) -> FastAPI:
         if not e:
             return JSONResponse({"ok": False, "error": "not found"}, status_code=404)
         now = time()
-        return JSONResponse({"ok": True, "name": name, "w": e.w, "h": e.h, "ts": e.ts, "age": now - e.ts})
+        return JSONResponse({"ok": True, "name": name, "w": e.w, "h": e.h, "ts": e.ts, "age": now - e.ts, "seq": e.seq})
 
     @app.get("/api/sockets/names")
     async def api_sockets_names(
@@ -117,15 +590,15 @@ def build_app(fps: float = 30.0) -> FastAPI:
             heartbeat: float = Query(15.0, description="send keepalive comment every N sec"),
     ):
         async def event_stream():
+            # pushed when a name is registered; with `alive`, names also expire, so
+            # re-check every `poll` seconds
             last_key = None
             last_sent = 0.0
             while True:
-                now = time()
-                names = store.names()
-                if alive is not None:
-                    names = [n for n in names if (store.latest(n) and (now - store.latest(n).ts) <= alive)]
-                names = sorted(set(names))
+                version = store.names_version
+                names = sorted(set(store.alive_names(alive)))
                 key = "|".join(names)
+                now = time()
 
                 if key != last_key:
                     last_key = key
@@ -136,7 +609,10 @@ def build_app(fps: float = 30.0) -> FastAPI:
                     yield f": keepalive {int(now)}\n\n"
                     last_sent = now
 
-                await asyncio.sleep(max(0.05, float(poll)))
+                timeout = heartbeat - (time() - last_sent)
+                if alive is not None:
+                    timeout = min(timeout, max(0.05, float(poll)))
+                await store.wait_names(version, max(0.0, timeout))
 
         headers = {"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Accel-Buffering": "no", }
         return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
@@ -146,21 +622,164 @@ def build_app(fps: float = 30.0) -> FastAPI:
         body = await req.body()
         if not body:
             return JSONResponse({"ok": False, "error": "empty"}, status_code=400)
-        arr = np.frombuffer(body, dtype=np.uint8)
-        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-        if img is None:
-            return JSONResponse({"ok": False, "error": "decode fail"}, status_code=400)
-        store.put_bgr(name, img)
-        h, w = img.shape[:2]
-        return JSONResponse({"ok": True, "w": w, "h": h})
+        size = store.put_jpeg(name, body)  # decoded later, only if a track or rendition needs pixels
+        if size is None:  # not a JPEG (e.g. PNG): decode now and serve it re-encoded
+            img = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                return JSONResponse({"ok": False, "error": "decode fail"}, status_code=400)
+            store.put_bgr(name, img)
+            size = img.shape[1], img.shape[0]
+        return JSONResponse({"ok": True, "w": size[0], "h": size[1]})
+
+    @app.get("/snapshot")
+    async def snapshot(
+            name: str = Query(...),
+            scale: float = Query(1.0, description="downscale factor, e.g. 0.25 or 0.5"),
+            roi: str | None = Query(None, description="normalized crop x1,y1,x2,y2"),
+    ):
+        try:
+            key = _rendition_key(scale, roi)
+        except ValueError as e:
+            return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
+        entry = store.latest(name)
+        if entry is None:
+            return JSONResponse({"ok": False, "error": "not found"}, status_code=404)
+        entry = await store.rendition_async(entry, key)
+        return Response(
+            content=await store.jpeg_async(entry),
+            media_type="image/jpeg",
+            headers={"Cache-Control": "no-store", "X-Seq": str(entry.seq), "X-Timestamp": str(entry.ts)},
+        )
+
+    @app.get("/mjpeg")
+    async def mjpeg(
+            name: str = Query(...),
+            fps: float | None = Query(None, description="max frames per second"),
+            scale: float = Query(1.0, description="downscale factor, e.g. 0.25 or 0.5"),
+            roi: str | None = Query(None, description="normalized crop x1,y1,x2,y2"),
+    ):
+        """
+        multipart/x-mixed-replace stream. All clients share the stored JPEG of a frame; a
+        client that cannot keep up simply gets the newest frame when it is ready again.
+        """
+        try:
+            key = _rendition_key(scale, roi)
+        except ValueError as e:
+            return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
+        boundary = "frame"
+
+        async def stream():
+            last_seq = 0
+            last_sent = 0.0
+            while True:
+                entry = await store.wait_newer(name, last_seq, timeout=keepalive)
+                if entry is None:
+                    continue
+                if fps:
+                    wait = 1.0 / fps - (monotonic() - last_sent)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                        entry = store.latest(name)
+                last_sent = monotonic()
+                last_seq = entry.seq
+                entry = await store.rendition_async(entry, key)
+                data = await store.jpeg_async(entry)
+                yield (
+                    f"--{boundary}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n"
+                    f"X-Seq: {entry.seq}\r\n\r\n"
+                ).encode() + data + b"\r\n"
+
+        headers = {"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+        return StreamingResponse(
+            stream(), media_type=f"multipart/x-mixed-replace; boundary={boundary}", headers=headers
+        )
+
+    @app.get("/api/history")
+    async def api_history(
+            name: str | None = Query(None),
+            start: float | None = Query(None, description="unix time"),
+            end: float | None = Query(None, description="unix time"),
+    ):
+        if name is None:
+            return JSONResponse({"ok": True, **store.history.summary()})
+        frames = [{"seq": seq, "ts": ts, "bytes": len(data)} for seq, ts, data in store.history.items(name, start, end)]
+        return JSONResponse({"ok": True, "name": name, "frames": frames})
+
+    @app.get("/history/frame")
+    async def history_frame(
+            name: str = Query(...),
+            ts: float | None = Query(None, description="unix time; the last frame at or before it"),
+            seq: int | None = Query(None),
+    ):
+        item = store.history.at(name, ts, seq)
+        if item is None:
+            return JSONResponse({"ok": False, "error": "not found"}, status_code=404)
+        return Response(
+            content=item[2],
+            media_type="image/jpeg",
+            headers={"Cache-Control": "no-store", "X-Seq": str(item[0]), "X-Timestamp": str(item[1])},
+        )
+
+    @app.get("/history/clip")
+    async def history_clip(
+            name: str = Query(...),
+            start: float | None = Query(None, description="unix time"),
+            end: float | None = Query(None, description="unix time"),
+            format: str = Query("mjpeg", description="mjpeg (played back in real time) or zip"),
+            speed: float = Query(1.0, description="mjpeg playback speed"),
+    ):
+        items = store.history.items(name, start, end)
+        if not items:
+            return JSONResponse({"ok": False, "error": "not found"}, status_code=404)
+        if format == "zip":
+            def build() -> bytes:
+                buf = io.BytesIO()
+                with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:  # already compressed
+                    for seq, ts, data in items:
+                        zf.writestr(f"{seq:08d}_{ts:.3f}.jpg", data)
+                return buf.getvalue()
+
+            return Response(
+                content=await asyncio.to_thread(build),
+                media_type="application/zip",
+                headers={"Content-Disposition": f'attachment; filename="{name}_{items[0][1]:.0f}.zip"'},
+            )
+        if format != "mjpeg":
+            return JSONResponse({"ok": False, "error": f"unknown format: {format}"}, status_code=400)
+        boundary = "frame"
+
+        async def stream():
+            t0 = monotonic()
+            for seq, ts, data in items:
+                wait = (ts - items[0][1]) / max(speed, 1e-3) - (monotonic() - t0)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                yield (
+                    f"--{boundary}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n"
+                    f"X-Seq: {seq}\r\nX-Timestamp: {ts}\r\n\r\n"
+                ).encode() + data + b"\r\n"
+
+        headers = {"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+        return StreamingResponse(
+            stream(), media_type=f"multipart/x-mixed-replace; boundary={boundary}", headers=headers
+        )
 
     @app.post("/offer")
-    async def offer(req: Request, name: str = Query(...)):
+    async def offer(
+            req: Request,
+            name: str = Query(...),
+            scale: float = Query(1.0, description="downscale factor, e.g. 0.25 or 0.5"),
+            roi: str | None = Query(None, description="normalized crop x1,y1,x2,y2"),
+    ):
+        try:
+            key = _rendition_key(scale, roi)
+        except ValueError as e:
+            return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
         data = await req.json()
         offer = RTCSessionDescription(sdp=data["sdp"], type=data["type"])
         pc = RTCPeerConnection()
         pcs.add(pc)
-        pc.addTrack(_NamedTrack(name=name, store=store, fps=fps))
+        pc.addTrack(_NamedTrack(name=name, store=store, fps=fps, keepalive=keepalive, rendition=key))
 
         @pc.on("connectionstatechange")
         async def on_connectionstatechange():
@@ -378,7 +997,8 @@ async function start(name) {{
     }}
   }}, 1500);
 
-  // also try server meta once (native size)
+  // also try server meta once (native size), and pick a rendition that fits the tile
+  let scale = 1;
   try {{
     const r = await fetch('/api/meta?name=' + encodeURIComponent(name));
     if (r.ok) {{
@@ -386,13 +1006,16 @@ async function start(name) {{
       if (m.ok) {{
         const rec = tiles.get(name);
         if (rec) setTitleText(rec.title, name, m.w, m.h);
+        const need = 2 * videoEl.clientWidth * (window.devicePixelRatio || 1);
+        if (m.w >= 4 * need) scale = 0.25;
+        else if (m.w >= 2 * need) scale = 0.5;
       }}
     }}
   }} catch(_){{}}
 
   const offer = await pc.createOffer({{ offerToReceiveVideo: true }});
   await pc.setLocalDescription(offer);
-  const resp = await fetch('/offer?name=' + encodeURIComponent(name), {{
+  const resp = await fetch('/offer?name=' + encodeURIComponent(name) + '&scale=' + scale, {{
     method: 'POST',
     headers: {{'Content-Type': 'application/json'}},
     body: JSON.stringify({{ sdp: pc.localDescription.sdp, type: pc.localDescription.type }})
@@ -461,9 +1084,15 @@ def main():
     ap.add_argument("--host", default="0.0.0.0")
     ap.add_argument("--port", type=int, default=2004)
     ap.add_argument("--fps", type=float, default=30.0)
+    ap.add_argument("--keepalive", type=float, default=1.0)
+    ap.add_argument("--history-frames", type=int, default=0, help="recent frames kept per name (0 = off)")
+    ap.add_argument("--history-mb", type=float, default=256.0, help="memory budget of the history over all names")
     args = ap.parse_args()
 
-    app = build_app(fps=args.fps)
+    app = build_app(
+        fps=args.fps, host=args.host, port=args.port, keepalive=args.keepalive,
+        history_frames=args.history_frames, history_mb=args.history_mb
+    )
     uvicorn.run(app, host=args.host, port=args.port)
 
 
@@ -0,0 +1,181 @@
+"""
+Shared-memory frame ring used between FramePublisher and server.py on the same host.
+
+Segment layout (little endian):
+    header  (64 bytes): magic b'HXFR', version u32, slots u32, pad u32, capacity u64,
+                        next_generation u64, write_seq u64
+    slot i  (32 bytes + capacity): seq u64, h u32, w u32, c u32, pad u32, ts f64, pixels
+
+The writer marks a slot with seq 0 while copying into it and publishes the new seq
+afterwards; a reader copies the pixels out and accepts the frame only if the slot's
+seq is the same before and after the copy. When a frame does not fit, the writer
+creates a new segment (`<base>_<generation>`) and sets `next_generation` in the old
+one so readers can follow.
+
+`ShmRingReader.read(copy=False)` returns a view into the slot instead; the caller checks
+`valid(seq)` after it is done with the pixels, and drops the view before the next read.
+"""
+from __future__ import annotations
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'HXFR'
+VERSION = 1
+_HEADER = struct.Struct('<4sIIIQQQ')
+_SLOT = struct.Struct('<QIIIId')
+_HEADER_SIZE = 64
+_SLOT_HEADER_SIZE = 32
+_NEXT_GENERATION_OFFSET = 24
+_WRITE_SEQ_OFFSET = 32
+
+
+def segment_name(base: str, generation: int) -> str:
+    return f"{base}_{generation}"
+
+
+_created = set()  # segments this process created; they stay registered with the resource tracker
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach without registering with the resource tracker, which would unlink the segment at exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if name in _created:  # unregistering would drop the writer's own registration
+            return shm
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')  # type: ignore[attr-defined]
+        except Exception:
+            pass
+        return shm
+
+
+class ShmRingWriter:
+    def __init__(self, base: str, slots: int = 3, capacity: int = 1920 * 1080 * 3) -> None:
+        self.base = base
+        self.slots = int(slots)
+        self.generation = 0
+        self.seq = 0
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self._create(capacity)
+
+    @property
+    def name(self) -> str:
+        return segment_name(self.base, self.generation)
+
+    def _create(self, capacity: int) -> None:
+        old = self.shm
+        if old is not None:
+            self.generation += 1
+        size = _HEADER_SIZE + self.slots * (_SLOT_HEADER_SIZE + capacity)
+        try:  # leftover from a crashed run
+            stale = _attach(self.name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        _created.add(self.name)
+        self.capacity = capacity
+        _HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, self.slots, 0, capacity, 0, self.seq)
+        if old is not None:
+            struct.pack_into('<Q', old.buf, _NEXT_GENERATION_OFFSET, self.generation)
+            old.close()
+            old.unlink()
+            _created.discard(old.name)
+
+    def write(self, frame: np.ndarray) -> Tuple[int, bool]:
+        """
+        Copy `frame` (uint8 HxW or HxWxC) into the next slot. Returns (seq, resized); after a
+        resize the segment name changed and readers have to be told (or follow next_generation).
+        """
+        h, w = frame.shape[:2]
+        c = frame.shape[2] if frame.ndim == 3 else 1
+        nbytes = h * w * c
+        resized = nbytes > self.capacity
+        if resized:
+            self._create(nbytes)
+        buf = self.shm.buf
+        self.seq += 1
+        offset = _HEADER_SIZE + (self.seq % self.slots) * (_SLOT_HEADER_SIZE + self.capacity)
+        struct.pack_into('<Q', buf, offset, 0)
+        dst = np.ndarray(frame.shape, dtype=np.uint8, buffer=buf, offset=offset + _SLOT_HEADER_SIZE)
+        np.copyto(dst, frame)
+        _SLOT.pack_into(buf, offset, self.seq, h, w, c, 0, time.time())
+        struct.pack_into('<Q', buf, _WRITE_SEQ_OFFSET, self.seq)
+        return self.seq, resized
+
+    def close(self) -> None:
+        if self.shm is not None:
+            self.shm.close()
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            _created.discard(self.shm.name)
+            self.shm = None
+
+
+class ShmRingReader:
+    def __init__(self, name: str) -> None:
+        self.base, generation = name.rsplit('_', 1)
+        self.generation = int(generation)
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.last_seq = 0
+        self._open()
+
+    def _open(self) -> None:
+        self.close()
+        self.shm = _attach(segment_name(self.base, self.generation))
+        magic, version, self.slots, _, self.capacity, _, _ = _HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a frame ring: {self.shm.name}")
+
+    def read(self, copy: bool = True, new_only: bool = True) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Latest frame as (seq, ts, pixels), or None if there is no (new, with `new_only`)
+        complete frame. With `copy=False` the pixels are a view into the ring that the writer
+        may overwrite; use them, then confirm with `valid(seq)`.
+        """
+        for _ in range(3):
+            buf = self.shm.buf
+            next_generation = struct.unpack_from('<Q', buf, _NEXT_GENERATION_OFFSET)[0]
+            if next_generation:
+                self.generation = next_generation
+                self._open()
+                continue
+            seq = struct.unpack_from('<Q', buf, _WRITE_SEQ_OFFSET)[0]
+            if seq == 0 or (new_only and seq == self.last_seq):
+                return None
+            offset = _HEADER_SIZE + (seq % self.slots) * (_SLOT_HEADER_SIZE + self.capacity)
+            s1, h, w, c, _, ts = _SLOT.unpack_from(buf, offset)
+            if s1 != seq:
+                continue  # being overwritten
+            shape = (h, w) if c == 1 else (h, w, c)
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=buf, offset=offset + _SLOT_HEADER_SIZE)
+            if copy:
+                frame = frame.copy()
+                if not self.valid(seq):
+                    continue  # torn read
+            self.last_seq = seq
+            return seq, ts, frame
+        return None
+
+    def valid(self, seq: int) -> bool:
+        """True if the slot of `seq` has not been rewritten since it was read."""
+        offset = _HEADER_SIZE + (seq % self.slots) * (_SLOT_HEADER_SIZE + self.capacity)
+        return struct.unpack_from('<Q', self.shm.buf, offset)[0] == seq
+
+    def close(self) -> None:
+        if self.shm is not None:
+            try:
+                self.shm.close()
+            except BufferError:  # a view from read(copy=False) is still alive; unmapped when collected
+                pass
+            self.shm = None
@@ -7,6 +7,7 @@ from .func import get_image, get_image_from_cam, get_image_from_url, \
 
 from .im import PILImage, PILImageDraw
 from .im import Image, ImageDraw, ImageFilter, ImageFont, Transpose, Transform, Resampling, Dither, Palette, Quantize
+from .im import load_font
 
 # from .detector import Detector
 # from .classifier import Classifier, MultiClassifier
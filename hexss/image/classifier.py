@@ -3,15 +3,20 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 from pprint import pprint
-from typing import Union, Optional, Any, Dict, List, Tuple, Self
+from typing import Union, Optional, Any, Dict, List, Tuple, Iterator, Self
 import concurrent.futures
+from collections import deque
+from time import perf_counter
 
 import hexss
 from hexss import json_load, json_dump, json_update
 from hexss.constants import *
 from hexss.path import shorten
 from hexss.pyconfig import Config
-from hexss.image import Image, ImageFont, PILImage
+from hexss.image import Image, ImageFont, PILImage, load_font
+from hexss.image.dataset import (
+    PackedDataset, IMAGE_SUFFIXES, SMOOTH, render_variants, render_sources, pack_dataset, params_hash
+)
 import numpy as np
 import cv2
 import matplotlib.pyplot as plt
@@ -27,6 +32,224 @@ except ImportError:
     from keras.models import load_model  # type: ignore
 
 
+def _augmented_datasets(
+        data_dir: Path,
+        img_size: Tuple[int, int],
+        batch_size: int,
+        validation_split: float,
+        seed: int,
+        augment: Dict[str, Any],
+) -> Tuple['tf.data.Dataset', 'tf.data.Dataset', List[str], int]:
+    """
+    Build train/validation datasets, class names and training samples per epoch from
+    source crops (`MultiClassifier.crop_sources_all`), drawing one shift/brightness/
+    contrast/sharpness variant per sample on the fly, in the same order and with the
+    same formulas as `crop_images_all`.
+
+    `augment` keys (all optional): shift_values, brightness_values, contrast_values,
+    sharpness_values (lists to pick from, like `crop_images_all`), margin (context pixels
+    saved around each crop, default 0), repeat (variants per source and epoch, default 1).
+    Validation samples are the center crop without augmentation.
+    """
+    shift_values = augment.get('shift_values') or [0]
+    brightness_values = augment.get('brightness_values') or [1.0]
+    contrast_values = augment.get('contrast_values') or [1.0]
+    sharpness_values = augment.get('sharpness_values') or [1.0]
+    margin = int(augment.get('margin', 0))
+    repeat = int(augment.get('repeat', 1))
+    pad = max(0, max(abs(v) for v in shift_values) - margin)
+
+    class_names = sorted(d.name for d in data_dir.iterdir() if d.is_dir())
+    paths, labels = [], []
+    for i, name in enumerate(class_names):
+        for f in sorted((data_dir / name).iterdir()):
+            if f.suffix.lower() in IMAGE_SUFFIXES:
+                paths.append(str(f))
+                labels.append(i)
+    if not paths:
+        raise ValueError(f"No images found in {data_dir}")
+    order = np.random.RandomState(seed).permutation(len(paths))
+    paths, labels = np.array(paths)[order], np.array(labels)[order]
+    n_val = int(len(paths) * validation_split)
+    print(f"Found {len(paths)} files belonging to {len(class_names)} classes.")
+    print(f"Using {len(paths) - n_val} files for training, {n_val} files for validation.")
+
+    smooth = tf.constant(np.tile(SMOOTH[..., None, None], (1, 1, 3, 1)))
+
+    def choice(values):
+        values = tf.constant(values, dtype=tf.float32)
+        return values[tf.random.uniform([], 0, len(values), dtype=tf.int32)]
+
+    def load(path, label):
+        im = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        return tf.pad(im, [[pad, pad], [pad, pad], [0, 0]]), label
+
+    def window(im, sx, sy):
+        h = tf.shape(im)[0] - 2 * (margin + pad)
+        w = tf.shape(im)[1] - 2 * (margin + pad)
+        im = tf.image.crop_to_bounding_box(im, margin + pad + sy, margin + pad + sx, h, w)
+        return tf.image.resize(tf.cast(im, tf.float32), img_size[::-1], method='bicubic')
+
+    def center(im, label):
+        return tf.clip_by_value(window(im, 0, 0), 0, 255), label
+
+    def augmented(im, label):
+        im = window(im, tf.cast(choice(shift_values), tf.int32), tf.cast(choice(shift_values), tf.int32))
+        im = tf.round(tf.clip_by_value(im, 0, 255))
+        sharp = choice(sharpness_values)
+        # like PIL, only the interior is filtered; the 1-px border keeps the source pixels
+        blurred = tf.nn.depthwise_conv2d(im[None], smooth, [1, 1, 1, 1], 'VALID')[0]
+        inner = im[1:-1, 1:-1]
+        inner = tf.round(tf.clip_by_value(blurred + (inner - blurred) * sharp, 0, 255))
+        im = im + tf.pad(inner - im[1:-1, 1:-1], [[1, 1], [1, 1], [0, 0]])
+        im = tf.round(tf.clip_by_value(im * choice(brightness_values), 0, 255))
+        mean = tf.round(tf.reduce_mean(tf.image.rgb_to_grayscale(im)))
+        im = tf.round(tf.clip_by_value(mean + (im - mean) * choice(contrast_values), 0, 255))
+        return im, label
+
+    AUTOTUNE = tf.data.AUTOTUNE
+    train_ds = (
+        tf.data.Dataset.from_tensor_slices((paths[n_val:], labels[n_val:]))
+        .map(load, num_parallel_calls=AUTOTUNE)
+        .cache()
+        .repeat(repeat)
+        .shuffle(1000, seed=seed)
+        .map(augmented, num_parallel_calls=AUTOTUNE)
+        .batch(batch_size)
+        .prefetch(AUTOTUNE)
+    )
+    val_ds = (
+        tf.data.Dataset.from_tensor_slices((paths[:n_val], labels[:n_val]))
+        .map(load, num_parallel_calls=AUTOTUNE)
+        .map(center, num_parallel_calls=AUTOTUNE)
+        .batch(batch_size)
+        .cache()
+        .prefetch(AUTOTUNE)
+    )
+    return train_ds, val_ds, class_names, (len(paths) - n_val) * repeat
+
+
+def _packed_datasets(
+        pack: PackedDataset,
+        batch_size: int,
+        validation_split: float,
+) -> Tuple['tf.data.Dataset', 'tf.data.Dataset']:
+    """
+    Train/validation datasets streamed from a `PackedDataset`. Samples were shuffled at
+    pack time, so validation is the first `validation_split` of the pack and each epoch
+    reads the shards sequentially; shuffling during training only mixes within a buffer.
+    """
+    n_val = int(len(pack) * validation_split)
+    W, H = pack.img_size
+    signature = (
+        tf.TensorSpec(shape=(None, H, W, 3), dtype=tf.uint8),
+        tf.TensorSpec(shape=(None,), dtype=tf.int32),
+    )
+    print(f"Found {len(pack)} packed files belonging to {len(pack.class_names)} classes.")
+    print(f"Using {len(pack) - n_val} files for training, {n_val} files for validation.")
+
+    def dataset(start, stop):
+        return tf.data.Dataset.from_generator(
+            lambda: pack.iter_batches(1024, start, stop), output_signature=signature
+        ).unbatch()
+
+    def to_float(im, label):
+        return tf.cast(im, tf.float32), label
+
+    AUTOTUNE = tf.data.AUTOTUNE
+    train_ds = (
+        dataset(n_val, len(pack))
+        .shuffle(4 * batch_size)
+        .batch(batch_size)
+        .map(to_float, num_parallel_calls=AUTOTUNE)
+        .prefetch(AUTOTUNE)
+    )
+    val_ds = dataset(0, n_val).batch(batch_size).map(to_float, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+    return train_ds, val_ds
+
+
+class _BestCheckpoints(keras.callbacks.Callback):
+    """
+    Save `<stem>_epochNNN.keras` only while it ranks among the `keep` best epochs by
+    `monitor`, deleting the file that drops out. The kept list lives in `cfg.checkpoints`
+    so a resumed run continues the ranking.
+    """
+
+    def __init__(self, model_path: Path, cfg: Config, monitor: str, keep: int) -> None:
+        super().__init__()
+        self.model_path = model_path
+        self.cfg = cfg
+        self.monitor = monitor
+        self.keep = keep
+        self.sign = 1 if 'acc' in monitor else -1
+
+    def on_epoch_end(self, epoch, logs=None):
+        value = (logs or {}).get(self.monitor)
+        if value is None or self.keep <= 0:
+            return
+        kept = [c for c in (self.cfg.checkpoints or []) if c['epoch'] <= epoch and Path(c['path']).exists()]
+        if len(kept) >= self.keep and self.sign * value <= min(self.sign * c[self.monitor] for c in kept):
+            return
+        path = self.model_path.with_name(f'{self.model_path.stem}_epoch{epoch + 1:03d}.keras')
+        self.model.save(path)
+        kept.append({'epoch': epoch + 1, 'path': str(path), self.monitor: float(value)})
+        kept.sort(key=lambda c: -self.sign * c[self.monitor])
+        for c in kept[self.keep:]:
+            Path(c['path']).unlink(missing_ok=True)
+        self.cfg.checkpoints = kept[:self.keep]
+
+
+class _EpochTelemetry(keras.callbacks.Callback):
+    """
+    After every epoch, write history, wall time and samples/sec to the .pycfg and redraw
+    the history plot, so a killed run keeps what it has done.
+    """
+
+    def __init__(self, classifier: 'Classifier', samples: int) -> None:
+        super().__init__()
+        self.classifier = classifier
+        self.samples = samples
+        self.t0 = 0.0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.t0 = perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = perf_counter() - self.t0
+        cfg = self.classifier.cfg
+        logs = {**(logs or {}), 'epoch_time': seconds, 'samples_per_sec': self.samples / seconds}
+        history = dict(cfg.history or {})
+        for k, v in logs.items():
+            history[k] = list(history.get(k, []))[:epoch] + [float(v)]
+        cfg.history = history
+        cfg.epochs_done = epoch + 1
+        self.classifier.plot_history(history)
+
+
+class _QueueProgress(keras.callbacks.Callback):
+    """Report (name, epoch, epochs, logs) of a worker's training to the parent process."""
+
+    def __init__(self, name: str, queue) -> None:
+        super().__init__()
+        self.name = name
+        self.queue = queue
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = {k: float(v) for k, v in (logs or {}).items()}
+        self.queue.put((self.name, epoch + 1, self.params.get('epochs'), logs))
+
+
+def _train_worker(name: str, model_path: str, threads: int, queue, kwargs: Dict[str, Any]) -> None:
+    """Entry point of a `MultiClassifier.train_all` worker process."""
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(min(2, threads))
+    try:
+        Classifier(model_path).train(callbacks=[_QueueProgress(name, queue)], **kwargs)
+    except BaseException as e:
+        queue.put((name, None, None, {'error': f'{type(e).__name__}: {e}'}))
+        raise
+
+
 class Classification:
     """
     Holds prediction results for one classification.
@@ -38,7 +261,7 @@ class Classification:
         conf: Confidence score of top prediction.
         group: Optional group name if mapping provided.
     """
-    __slots__ = ('predictions', 'class_names', 'idx', 'name', 'conf', 'group', 'xywhn')
+    __slots__ = ('predictions', 'class_names', 'idx', 'name', 'conf', 'group', 'xywhn', '_softmax')
 
     def __init__(
             self,
@@ -55,15 +278,40 @@ class Classification:
         self.conf = float(self.predictions[self.idx])
         self.group = group
         self.xywhn = xywhn
+        self._softmax: Dict[float, np.ndarray] = {}
         if mapping:
             for group_name, labels in mapping.items():
                 if self.name in labels:
                     self.group = group_name
                     break
 
+    @classmethod
+    def _view(
+            cls,
+            predictions: np.ndarray,
+            class_names: List[str],
+            idx: int,
+            group: Optional[str],
+            xywhn: Any,
+            softmax: Dict[float, np.ndarray]
+    ) -> 'Classification':
+        """Build from values already computed by `Classifications`, without copying the row."""
+        self = cls.__new__(cls)
+        self.predictions = predictions
+        self.class_names = class_names
+        self.idx = idx
+        self.name = class_names[idx]
+        self.conf = float(predictions[idx])
+        self.group = group
+        self.xywhn = xywhn
+        self._softmax = softmax
+        return self
+
     def softmax_preds(self, base: float = np.e) -> np.ndarray:
-        exp_vals = np.power(base, self.predictions - np.max(self.predictions))
-        return exp_vals / exp_vals.sum()
+        if base not in self._softmax:
+            exp_vals = np.power(base, self.predictions - np.max(self.predictions))
+            self._softmax[base] = exp_vals / exp_vals.sum()
+        return self._softmax[base]
 
     def conf_softmax(self, base: float = np.e) -> np.ndarray:
         return self.softmax_preds(base)[self.idx]
@@ -72,6 +320,114 @@ class Classification:
         return f"<idx={self.idx} name={self.name!r} group={self.group!r}>"
 
 
+class Classifications:
+    """
+    Prediction results for a batch, as an (N, C) matrix.
+
+    Attributes:
+        predictions: (N, C) raw model outputs, float64.
+        class_names: List of class labels.
+        idx: (N,) index of the top prediction per row.
+        conf: (N,) raw score of the top prediction.
+        group_names: Groups of `mapping`, in order.
+        group_idx: (N,) index into `group_names` of the top prediction's group, -1 if none.
+
+    `names` / `groups` are per-row labels. Iterating (or indexing with an int) yields
+    `Classification` views that share this batch's rows and softmax cache.
+    """
+    __slots__ = ('predictions', 'class_names', 'idx', 'conf', 'group_names', 'group_idx', 'xywhn', '_softmax',
+                 '_rows')
+
+    def __init__(
+            self,
+            predictions: np.ndarray,
+            class_names: List[str],
+            mapping: Optional[Dict[str, List[str]]] = None,
+            xywhn: Optional[List[Any]] = None
+    ) -> None:
+        self.predictions = np.asarray(predictions, dtype=np.float64).reshape(-1, len(class_names))
+        self.class_names = class_names
+        self.idx = self.predictions.argmax(axis=1)
+        self.conf = self.predictions[np.arange(len(self.idx)), self.idx]
+        self.group_names, class_group = self.group_index(class_names, mapping)
+        self.group_idx = class_group[self.idx]
+        self.xywhn = xywhn if xywhn is not None else [None] * len(self.idx)
+        self._softmax: Dict[float, np.ndarray] = {}
+        self._rows: List[Dict[float, np.ndarray]] = [{} for _ in range(len(self.idx))]
+
+    @staticmethod
+    def group_index(
+            class_names: List[str],
+            mapping: Optional[Dict[str, List[str]]] = None
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        (group names, (C,) group index per class, -1 if unmapped). The first group listing
+        a class wins, as in `Classification`.
+        """
+        group_names = list(mapping or {})
+        class_group = np.full(len(class_names), -1, dtype=int)
+        for g in reversed(range(len(group_names))):
+            for label in mapping[group_names[g]]:
+                if label in class_names:
+                    class_group[class_names.index(label)] = g
+        return group_names, class_group
+
+    @property
+    def names(self) -> List[str]:
+        return [self.class_names[i] for i in self.idx]
+
+    @property
+    def groups(self) -> List[Optional[str]]:
+        return [self.group_names[g] if g >= 0 else None for g in self.group_idx]
+
+    def softmax(self, base: float = np.e) -> np.ndarray:
+        """(N, C) softmax with `base`, cached per base."""
+        if base not in self._softmax:
+            exp_vals = np.power(base, self.predictions - self.predictions.max(axis=1, keepdims=True))
+            self._softmax[base] = exp_vals / exp_vals.sum(axis=1, keepdims=True)
+        return self._softmax[base]
+
+    def conf_softmax(self, base: float = np.e) -> np.ndarray:
+        """(N,) softmax confidence of the top prediction."""
+        return self.softmax(base)[np.arange(len(self)), self.idx]
+
+    def topk(self, k: int, base: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (N, k) class indices and scores of the k best predictions per row, best first.
+        Scores are softmax with `base`, or raw predictions if `base` is None.
+        """
+        scores = self.predictions if base is None else self.softmax(base)
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def confident(self, threshold: float, base: float = np.e) -> np.ndarray:
+        """(N,) bool, top softmax confidence >= `threshold`."""
+        return self.conf_softmax(base) >= threshold
+
+    def __len__(self) -> int:
+        return len(self.idx)
+
+    def __iter__(self) -> Iterator[Classification]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i: int) -> Classification:
+        i = range(len(self))[i]
+        for base, sm in self._softmax.items():
+            self._rows[i].setdefault(base, sm[i])
+        g = self.group_idx[i]
+        return Classification._view(
+            self.predictions[i], self.class_names, int(self.idx[i]),
+            self.group_names[g] if g >= 0 else None, self.xywhn[i], self._rows[i]
+        )
+
+    def __repr__(self) -> str:
+        return f"<Classifications n={len(self)} classes={len(self.class_names)}>"
+
+
 class Classifier:
     """
     Wraps a Keras model for image classification.
@@ -114,6 +470,10 @@ class Classifier:
         if self.cfg.batch_size is None: self.cfg.batch_size = 64
         if self.cfg.validation_split is None: self.cfg.validation_split = 0.2
         if self.cfg.seed is None: self.cfg.seed = 123
+        if self.cfg.monitor is None: self.cfg.monitor = 'val_loss'
+        if self.cfg.early_stopping_patience is None: self.cfg.early_stopping_patience = 0  # 0 = off
+        if self.cfg.reduce_lr_patience is None: self.cfg.reduce_lr_patience = 0  # 0 = off
+        if self.cfg.reduce_lr_factor is None: self.cfg.reduce_lr_factor = 0.5
         if self.cfg.layers is None:
             self.cfg._ensure_import("keras")
             self.cfg._update_block("layers", """
@@ -171,45 +531,118 @@ class Classifier:
         """
         if self.model is None:
             raise ValueError("Model is not loaded. Call train() or load an existing model.")
-        batch = self._prepare_image(im)
-        preds = self.model.predict(batch, verbose=0)[0]
-        return Classification(
+        return self._classify_prepared(self._prepare_image(im), mapping=mapping, xywhn=[xywhn])[0]
+
+    def _classify_prepared(
+            self,
+            batch: np.ndarray,
+            mapping: Optional[Dict[str, List[str]]] = None,
+            xywhn: Optional[List[Any]] = None
+    ) -> Classifications:
+        """
+        Run one forward pass over a batch built by `_prepare_image` (N, H, W, 3).
+        """
+        if self.model is None:
+            raise ValueError("Model is not loaded. Call train() or load an existing model.")
+        preds = self.model.predict(batch, verbose=0)
+        return Classifications(
             predictions=preds,
             class_names=self.cfg.class_names,
             mapping=mapping or self.cfg.result_mapping,
             xywhn=xywhn
         )
 
+    def classify_batch(
+            self,
+            ims: List[Union[Image, PILImage.Image, np.ndarray]],
+            mapping: Optional[Dict[str, List[str]]] = None,
+            xywhn: Optional[List[Any]] = None
+    ) -> Classifications:
+        """
+        Classify several images with a single forward pass.
+        """
+        if not ims:
+            return Classifications(np.zeros((0, len(self.cfg.class_names))), self.cfg.class_names)
+        batch = np.concatenate([self._prepare_image(im) for im in ims])
+        return self._classify_prepared(batch, mapping=mapping, xywhn=xywhn)
+
     def predict(self, *args, **kwargs):
         return self.classify(*args, **kwargs)
 
     def train(
             self,
             data_dir: Union[Path, str] = 'datasets',
+            augment: Optional[Dict[str, Any]] = None,
+            resume: bool = True,
+            keep_checkpoints: int = 3,
+            callbacks: Optional[List[Any]] = None,
             **kwargs
     ) -> None:
-
+        """
+        Train on `data_dir/<class_name>/*` images, or on a pack written by
+        `hexss.image.dataset.pack_dataset` when `data_dir` contains `index.json` (its
+        img_size must match `cfg.img_size`).
+
+        With `augment` (see `_augmented_datasets`), `data_dir` holds one source crop per
+        sample and variants are generated on the fly instead of read from disk.
+
+        Progress is backed up every epoch to `<stem>_backup/`; calling train again after an
+        interrupted run resumes from there unless `resume=False`. Only the
+        `keep_checkpoints` best epochs (by `cfg.monitor`) are kept as `<stem>_epochNNN.keras`.
+        `cfg.early_stopping_patience` and `cfg.reduce_lr_patience` (0 = off) enable early
+        stopping and learning-rate reduction by `cfg.reduce_lr_factor`. History, epoch time
+        and samples/sec are written to the .pycfg after every epoch. `callbacks` are added
+        to the Keras callbacks.
+        """
         data_dir = Path(data_dir)
         for k, v in kwargs.items():
             self.cfg.__setattr__(k, v)
 
-        train_ds, val_ds = keras.utils.image_dataset_from_directory(
-            data_dir,
-            validation_split=self.cfg.validation_split,
-            subset='both',
-            seed=self.cfg.seed,
-            image_size=self.cfg.img_size,
-            batch_size=self.cfg.batch_size
-        )
-        self.cfg.class_names = train_ds.class_names
+        AUTOTUNE = tf.data.AUTOTUNE
+        if augment is not None:
+            self.cfg.augment = augment
+            train_ds, val_ds, class_names, samples = _augmented_datasets(
+                data_dir,
+                img_size=tuple(self.cfg.img_size),
+                batch_size=self.cfg.batch_size,
+                validation_split=self.cfg.validation_split,
+                seed=self.cfg.seed,
+                augment=augment
+            )
+            self.cfg.class_names = class_names
+        elif PackedDataset.exists(data_dir):
+            pack = PackedDataset(data_dir)
+            if tuple(pack.img_size) != tuple(self.cfg.img_size):
+                raise ValueError(f"Pack img_size {pack.img_size} does not match model img_size {self.cfg.img_size}")
+            train_ds, val_ds = _packed_datasets(pack, self.cfg.batch_size, self.cfg.validation_split)
+            samples = len(pack) - int(len(pack) * self.cfg.validation_split)
+            self.cfg.class_names = pack.class_names
+        else:
+            train_ds, val_ds = keras.utils.image_dataset_from_directory(
+                data_dir,
+                validation_split=self.cfg.validation_split,
+                subset='both',
+                seed=self.cfg.seed,
+                image_size=self.cfg.img_size,
+                batch_size=self.cfg.batch_size
+            )
+            self.cfg.class_names = train_ds.class_names
+            samples = len(train_ds.file_paths)
+            train_ds = train_ds.cache().shuffle(1000).prefetch(AUTOTUNE)
+            val_ds = val_ds.cache().prefetch(AUTOTUNE)
+        backup_dir = self.model_path.with_name(f'{self.model_path.stem}_backup')
+        if not resume:
+            shutil.rmtree(backup_dir, ignore_errors=True)
+        resuming = backup_dir.exists()
+        if resuming:
+            print(f"{YELLOW}Resuming from {backup_dir}{END}")
+        else:
+            self.cfg.history = {}
+            self.cfg.checkpoints = []
+            self.cfg.start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         start_time = datetime.now()
-        self.cfg.start_time = start_time.strftime("%Y-%m-%d %H:%M:%S")
 
         # Build model
-
-        AUTOTUNE = tf.data.AUTOTUNE
-        train_ds = train_ds.cache().shuffle(1000).prefetch(AUTOTUNE)
-        val_ds = val_ds.cache().prefetch(AUTOTUNE)
         self.model = keras.Sequential(self.cfg.layers)
         self.model.compile(
             optimizer='adam',
@@ -218,20 +651,28 @@ class Classifier:
         )
         self.model.summary()
 
-        # Save model after each epoch
-        checkpoint_callback = keras.callbacks.ModelCheckpoint(
-            filepath=self.model_path.with_name(f'{self.model_path.stem}_epoch{{epoch:03d}}.keras'),
-            save_freq='epoch',
-            save_weights_only=False,
-            verbose=0
-        )
+        monitor = self.cfg.monitor
+        callbacks = [
+            keras.callbacks.BackupAndRestore(backup_dir),
+            _EpochTelemetry(self, samples),
+            _BestCheckpoints(self.model_path, self.cfg, monitor, keep_checkpoints),
+            *(callbacks or []),
+        ]
+        if self.cfg.early_stopping_patience:
+            callbacks.append(keras.callbacks.EarlyStopping(
+                monitor=monitor, patience=self.cfg.early_stopping_patience, restore_best_weights=True, verbose=1
+            ))
+        if self.cfg.reduce_lr_patience:
+            callbacks.append(keras.callbacks.ReduceLROnPlateau(
+                monitor=monitor, factor=self.cfg.reduce_lr_factor, patience=self.cfg.reduce_lr_patience, verbose=1
+            ))
 
         # Train
-        history = self.model.fit(
+        self.model.fit(
             train_ds,
             validation_data=val_ds,
             epochs=self.cfg.epochs,
-            callbacks=[checkpoint_callback]
+            callbacks=callbacks
         )
 
         # Save final model
@@ -240,14 +681,15 @@ class Classifier:
         end_time = datetime.now()
 
         self.cfg.end_time = end_time.strftime("%Y-%m-%d %H:%M:%S")
-        self.cfg.time_spent_training = (end_time - start_time).total_seconds()
-        self.cfg.history = history.history
-
-        # Plot training history
-        acc = history.history.get('accuracy', [])
-        val_acc = history.history.get('val_accuracy', [])
-        loss = history.history.get('loss', [])
-        val_loss = history.history.get('val_loss', [])
+        self.cfg.time_spent_training = (end_time - start_time).total_seconds() \
+            if not resuming else float(sum((self.cfg.history or {}).get('epoch_time', [])))
+
+    def plot_history(self, history: Dict[str, List[float]]) -> None:
+        """Save the accuracy/loss curves next to the model."""
+        acc = history.get('accuracy', [])
+        val_acc = history.get('val_accuracy', [])
+        loss = history.get('loss', [])
+        val_loss = history.get('val_loss', [])
         epochs_range = range(len(acc))
 
         plt.figure(figsize=(8, 8))
@@ -270,56 +712,122 @@ class Classifier:
             data_dir: Union[Path, str],
             threshold: float = 0.7,
             multiprocessing: bool = False,
-    ) -> Dict[str, int]:
+            batch_size: int = 64,
+            max_workers: Optional[int] = None,
+            progress_interval: float = 0.5,
+    ) -> Dict[str, Any]:
         """
         Test model on images in each class subfolder and print results.
+        `data_dir` may also be a pack written by `hexss.image.dataset.pack_dataset`.
+
+        Images are decoded by a bounded thread pool (`max_workers` threads, one unless
+        `multiprocessing`) while the model runs `batch_size` images per forward pass.
+        Mismatches and uncertain results are printed as they happen; progress is printed
+        at most every `progress_interval` seconds.
+
+        Returns counts ('correct', 'uncertain', 'wrong', 'total') together with
+        'confusion' (true x predicted, over `class_names`), per-class 'precision' and
+        'recall' arrays, and 'class_names'.
         """
+        if self.model is None:
+            raise ValueError("Model is not loaded. Call train() or load an existing model.")
         data_dir = Path(data_dir)
-        total = 0
-        results = []
-
-        def _test_one(name: str, img_path: Path, i: int, total: int) -> str:
-            im = Image.open(img_path)
-            clf = self.classify(im)
-            prob = clf.conf_softmax(1.2)
-            is_match = (clf.name == name)
-            is_confident = is_match and prob >= threshold
-            short = shorten(img_path, 2, 3)
-            if is_confident:
-                print(end=f'\r{name}({i}/{total}) {GREEN}{clf.name},{prob:.2f}{END} {short}')
-                return 'correct'
-            elif is_match:
-                print(end=f'\r{name}({i}/{total}) {YELLOW}{clf.name},{prob:.2f}{END} {short}\n')
-                return 'uncertain'
-            else:
-                print(end=f'\r{name}({i}/{total}) {RED}{clf.name},{prob:.2f}{END} {short}\n')
-                return 'wrong'
+        if PackedDataset.exists(data_dir):
+            pack = PackedDataset(data_dir)
+            if tuple(pack.img_size) != tuple(self.cfg.img_size):
+                raise ValueError(f"Pack img_size {pack.img_size} does not match model img_size {self.cfg.img_size}")
+            label_map = np.array([self.cfg.class_names.index(n) for n in pack.class_names])
+            batches = (
+                (np.asarray(images), label_map[labels], pack.paths[start:start + len(labels)])
+                for start, (images, labels) in zip(range(0, len(pack), batch_size), pack.iter_batches(batch_size))
+            )
+            return self._evaluate(batches, len(pack), threshold, progress_interval)
 
-        for name in self.cfg.class_names:
+        items = []
+        for label, name in enumerate(self.cfg.class_names):
             folder = data_dir / name
-            if not folder.exists():
-                continue
-            images = [f for f in folder.iterdir() if f.suffix.lower() in {'.png', '.jpg', '.jpeg', '.bmp', '.gif'}]
-            total = len(images)
-            if total == 0:
-                continue
-
-            if multiprocessing:
-                with concurrent.futures.ThreadPoolExecutor() as ex:
-                    futures = [
-                        ex.submit(_test_one, name, img_path, i + 1, total)
-                        for i, img_path in enumerate(images)
-                    ]
-                    results = [f.result() for f in futures]
-            else:
-                for i, img_path in enumerate(images):
-                    results.append(_test_one(name, img_path, i + 1, len(images)))
-        print("\r")
-
-        correct = results.count('correct')
-        uncertain = results.count('uncertain')
-        wrong = results.count('wrong')
-        return {'correct': correct, 'uncertain': uncertain, 'wrong': wrong, 'total': total}
+            if folder.exists():
+                items.extend((f, label) for f in folder.iterdir() if f.suffix.lower() in IMAGE_SUFFIXES)
+        if max_workers is None and not multiprocessing:
+            max_workers = 1
+        batches = self._decoded_batches(items, batch_size, max_workers)
+        return self._evaluate(batches, len(items), threshold, progress_interval)
+
+    def _load_prepared(self, path: Path) -> np.ndarray:
+        arr = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return self._prepare_image(arr if arr is not None else Image.open(path))
+
+    def _decoded_batches(
+            self,
+            items: List[Tuple[Path, int]],
+            batch_size: int,
+            max_workers: Optional[int] = None,
+    ):
+        """
+        Yield (batch, labels, paths) with at most two batches of images decoding ahead.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            it = iter(items)
+            pending = deque()
+
+            def submit() -> None:
+                item = next(it, None)
+                if item is not None:
+                    pending.append((executor.submit(self._load_prepared, item[0]), *item))
+
+            for _ in range(2 * batch_size):
+                submit()
+            arrays, labels, paths = [], [], []
+            while pending:
+                future, path, label = pending.popleft()
+                submit()
+                try:
+                    arrays.append(future.result())
+                except Exception as e:
+                    print(f"\r{RED}Error loading {path}: {e}{END}")
+                    continue
+                labels.append(label)
+                paths.append(path)
+                if len(arrays) == batch_size:
+                    yield np.concatenate(arrays), np.array(labels), paths
+                    arrays, labels, paths = [], [], []
+            if arrays:  # the last images, also when the very last one failed to load
+                yield np.concatenate(arrays), np.array(labels), paths
+
+    def _evaluate(self, batches, total: int, threshold: float, progress_interval: float) -> Dict[str, Any]:
+        class_names = self.cfg.class_names
+        confusion = np.zeros((len(class_names), len(class_names)), dtype=np.int64)
+        counts = {'correct': 0, 'uncertain': 0, 'wrong': 0}
+        done = 0
+        last_print = perf_counter()
+        for batch, labels, paths in batches:
+            clfs = self._classify_prepared(batch)
+            np.add.at(confusion, (labels, clfs.idx), 1)
+            probs = clfs.conf_softmax(1.2)
+            match = clfs.idx == labels
+            confident = probs >= threshold
+            counts['correct'] += int(np.count_nonzero(match & confident))
+            counts['uncertain'] += int(np.count_nonzero(match & ~confident))
+            counts['wrong'] += int(np.count_nonzero(~match))
+            for i in np.flatnonzero(~(match & confident)):
+                colour = YELLOW if match[i] else RED
+                print(f'\r{class_names[labels[i]]} {colour}{class_names[clfs.idx[i]]},{probs[i]:.2f}{END} '
+                      f'{shorten(paths[i], 2, 3)}')
+            done += len(labels)
+            if perf_counter() - last_print >= progress_interval:
+                last_print = perf_counter()
+                print(end=f'\r({done}/{total}) {GREEN}{counts["correct"]}{END} '
+                          f'{YELLOW}{counts["uncertain"]}{END} {RED}{counts["wrong"]}{END}')
+        print(f'\r({done}/{total})')
+
+        tp = np.diag(confusion)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(confusion.sum(0) > 0, tp / confusion.sum(0), np.nan)
+            recall = np.where(confusion.sum(1) > 0, tp / confusion.sum(1), np.nan)
+        return {
+            **counts, 'total': done,
+            'confusion': confusion, 'precision': precision, 'recall': recall, 'class_names': class_names
+        }
 
     def __repr__(self) -> str:
         return (
@@ -333,7 +841,8 @@ class MultiClassifier:
     Manages multiple named classifiers applied to subregions (frames) of full images.
 
     Attributes:
-        base_path: Directory containing 'frames pos.json', 'img_full', 'img_frame', 'img_frame_log', and 'model'.
+        base_path: Directory containing 'frames pos.json', 'img_full', 'img_frame', 'img_frame_log',
+            'img_frame_src', 'img_frame_pack' and 'model'.
         frames: Mapping of frame keys to frame metadata (xywhn, model, result_mapping).
         models: Loaded Classifier instances keyed by model name.
     """
@@ -349,6 +858,8 @@ class MultiClassifier:
         self.img_full_dir = self.base_path / 'img_full'
         self.img_frame_dir = self.base_path / 'img_frame'
         self.img_frame_log_dir = self.base_path / 'img_frame_log'
+        self.img_frame_src_dir = self.base_path / 'img_frame_src'
+        self.img_frame_pack_dir = self.base_path / 'img_frame_pack'
         self.model_dir = self.base_path / 'model'
 
         # load models
@@ -403,77 +914,138 @@ class MultiClassifier:
             brightness_values: Optional[List[float]] = None,
             contrast_values: Optional[List[float]] = None,
             sharpness_values: Optional[List[float]] = None,
+            max_workers: Optional[int] = None,
+            rebuild: bool = False,
     ) -> None:
         """
         For each full image JSON and PNG pair in img_full, crop each defined frame,
         log original crops, then generate and save variations by shift, brightness,
         contrast, and sharpness settings.
+
+        Each full image is decoded once for all models, in a process pool. The run is
+        incremental: `img_frame/manifest.json` keeps a content hash per source image and
+        only new or changed images are regenerated. Changing any parameter or frame
+        definition (or `rebuild=True`) regenerates everything.
         """
-        shift_values = shift_values or [0]
-        brightness_values = brightness_values or [1.0]
-        contrast_values = contrast_values or [1.0]
-        sharpness_values = sharpness_values or [1.0]
 
-        def process_one_image(file_name):
-            json_path = self.img_full_dir / f"{file_name}.json"
-            img_path = self.img_full_dir / f"{file_name}.png"
-            try:
-                frames_status = json_load(json_path)
-                im = Image(img_path)
-            except Exception as e:
-                print(f"{RED}Error loading {file_name}: {e}{END}")
-                return
-
-            for frame_name, status in frames_status.items():
-                if frame_name not in self.frames:
-                    print(f'{frame_name} not in frames')
-                    continue
-                frame = self.frames[frame_name]
-                if frame['model'] != model_name:
-                    continue
-                print(end=f'\r{file_name} {model_name} {frame_name} {status}')
-
-                # Save original cropped image
-                log_dir = self.img_frame_log_dir / model_name
-                variant_dir = self.img_frame_dir / model_name / status
-                # log_dir.mkdir(parents=True, exist_ok=True)
-                variant_dir.mkdir(parents=True, exist_ok=True)
-
-                xywhn = frame['xywhn']
-                im.crop(xywhn=xywhn).save(log_dir / f"{status}_{frame_name}_{file_name}.png")
-
-                for sx in shift_values:
-                    for sy in shift_values:
-                        im_crop = im.crop(xywhn=xywhn, shift=(sx, sy)).resize(img_size)
-                        for b in brightness_values:
-                            for c in contrast_values:
-                                for sharp in sharpness_values:
-                                    im_variant = im_crop.copy().sharpness(sharp).brightness(b).contrast(c)
-                                    output_filename = f"{file_name}!{frame_name}!{status}!{sx}!{sy}!{b}!{c}!{sharp}.png"
-                                    im_variant.save(variant_dir / output_filename)
-            print(f'\rProcessed {file_name} ({model_name})')
-
-        for model_name in self.models.keys():
-            print(f'{CYAN}==== {model_name} ===={END}')
-
-            # clear old outputs
-            shutil.rmtree(self.img_frame_dir / model_name, ignore_errors=True)
-            shutil.rmtree(self.img_frame_log_dir / model_name, ignore_errors=True)
-
-            # crop image
-            img_files = sorted(
-                {f.stem for f in self.img_full_dir.glob("*") if f.suffix in ['.png', '.json']},
-                reverse=True
+        self._render_all(render_variants, self.img_frame_dir, [self.img_frame_log_dir], {
+            'img_size': list(img_size),
+            'shift_values': shift_values or [0],
+            'brightness_values': brightness_values or [1.0],
+            'contrast_values': contrast_values or [1.0],
+            'sharpness_values': sharpness_values or [1.0],
+            'img_frame_dir': str(self.img_frame_dir),
+            'img_frame_log_dir': str(self.img_frame_log_dir),
+        }, max_workers=max_workers, rebuild=rebuild)
+
+    def crop_sources_all(
+            self,
+            margin: int = 0,
+            max_workers: Optional[int] = None,
+            rebuild: bool = False,
+    ) -> None:
+        """
+        Save one crop per frame and full image into `img_frame_src/<model>/<status>/`,
+        with `margin` pixels of context on each side, for training with on-the-fly
+        augmentation (`train_all(augment=...)`). Incremental like `crop_images_all`.
+        """
+
+        self._render_all(render_sources, self.img_frame_src_dir, [], {
+            'margin': int(margin),
+            'img_frame_src_dir': str(self.img_frame_src_dir),
+        }, max_workers=max_workers, rebuild=rebuild)
+
+    def pack_all(
+            self,
+            img_size: Tuple[int, int],
+            shard_size: int = 4096,
+            seed: int = 123,
+            max_workers: Optional[int] = None,
+    ) -> None:
+        """
+        Pack img_frame/<model> into sharded arrays under img_frame_pack/<model>
+        (see `hexss.image.dataset.pack_dataset`), for `train_all(packed=True)` and `test_all`.
+        """
+
+        for model_name in self.models:
+            print(f'{CYAN}==== Packing {model_name} ===={END}')
+            pack_dataset(
+                self.img_frame_dir / model_name, self.img_frame_pack_dir / model_name, img_size,
+                shard_size=shard_size, seed=seed, max_workers=max_workers
             )
 
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = [
-                    executor.submit(process_one_image, file_name)
-                    for file_name in img_files
-                ]
-                for f in concurrent.futures.as_completed(futures):
-                    pass
-            print()
+    def _render_all(
+            self,
+            render,
+            out_dir: Path,
+            extra_dirs: List[Path],
+            params: Dict[str, Any],
+            max_workers: Optional[int] = None,
+            rebuild: bool = False,
+    ) -> None:
+        """
+        Run `render(task)` from hexss.image.dataset for each full image that changed since
+        the last run, in a process pool. `out_dir/manifest.json` tracks what was written.
+        """
+
+        models = sorted(self.models.keys())
+        frames = {k: {'xywhn': f['xywhn'], 'model': f['model']} for k, f in self.frames.items()}
+        params = {**params, 'models': models, 'frames': frames}
+        manifest_path = out_dir / 'manifest.json'
+        manifest = json_load(manifest_path, {'params': None, 'files': {}})
+        if rebuild or manifest['params'] != params_hash(params):
+            print(f'{CYAN}==== rebuild {", ".join(models)} ===={END}')
+            for model_name in models:
+                # clear old outputs
+                for d in [out_dir, *extra_dirs]:
+                    shutil.rmtree(d / model_name, ignore_errors=True)
+            manifest = {'params': params_hash(params), 'files': {}}
+        files: Dict[str, Dict[str, Any]] = manifest['files']
+
+        img_files = sorted(
+            {f.stem for f in self.img_full_dir.glob("*") if f.suffix in ['.png', '.json']},
+            reverse=True
+        )
+        for file_name in set(files) - set(img_files):  # source removed
+            for path in files.pop(file_name)['outputs']:
+                Path(path).unlink(missing_ok=True)
+
+        tasks = []
+        for file_name in img_files:
+            img_path = self.img_full_dir / f"{file_name}.png"
+            json_path = self.img_full_dir / f"{file_name}.json"
+            entry = files.get(file_name)
+            stat = [img_path.stat().st_mtime_ns, json_path.stat().st_mtime_ns] \
+                if img_path.exists() and json_path.exists() else None
+            if entry and stat and entry.get('stat') == stat:
+                continue
+            tasks.append({
+                **params,
+                'file_name': file_name, 'img_path': str(img_path), 'json_path': str(json_path),
+                'previous_hash': entry and entry['hash'], 'previous_outputs': entry and entry['outputs'],
+                'stat': stat,
+            })
+
+        print(f'{CYAN}==== {len(tasks)} of {len(img_files)} images to process ===={END}')
+        stats = {task['file_name']: task['stat'] for task in tasks}
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+                futures = [executor.submit(render, task) for task in tasks]
+                for i, f in enumerate(concurrent.futures.as_completed(futures)):
+                    file_name, source_hash, written, error = f.result()
+                    if error:
+                        print(f"\r{RED}{error}{END}")
+                        for path in files.pop(file_name, {}).get('outputs', []):
+                            Path(path).unlink(missing_ok=True)
+                        continue
+                    if written is None:  # touched but same content
+                        files[file_name]['stat'] = stats[file_name]
+                        continue
+                    files[file_name] = {'hash': source_hash, 'stat': stats[file_name], 'outputs': written}
+                    print(end=f'\rProcessed {file_name} ({i + 1}/{len(tasks)})')
+        finally:
+            json_dump(manifest_path, manifest)
+        print()
 
     def train_all(
             self,
@@ -482,26 +1054,117 @@ class MultiClassifier:
             batch_size: int = 64,
             validation_split: float = 0.2,
             seed: int = 123,
-            layers: Optional[List[Any]] = None
+            layers: Optional[List[Any]] = None,
+            augment: Optional[Dict[str, Any]] = None,
+            packed: bool = False,
+            processes: int = 1,
+            cpu_budget: Optional[int] = None,
+            threads_per_model: Optional[int] = None,
     ) -> None:
         """
         Train each model using its corresponding directory under img_frame.
+
+        With `augment`, train from img_frame_src instead (see `crop_sources_all`), generating
+        the variants on the fly. `augment['margin']` must match the margin of the crops.
+        With `packed=True`, train from img_frame_pack (see `pack_all`).
+
+        With `processes > 1`, up to that many models train at the same time, each in its own
+        process with `threads_per_model` TensorFlow threads (default: `cpu_budget //
+        processes`). A model starts only while the threads in use fit in `cpu_budget`
+        (default: all cores). `layers`, if given, must be picklable; otherwise keep them
+        in each model's .pycfg.
         """
         self.img_full_dir.mkdir(parents=True, exist_ok=True)
         self.img_frame_dir.mkdir(parents=True, exist_ok=True)
         self.model_dir.mkdir(parents=True, exist_ok=True)
+        if augment is not None:
+            data_dir = self.img_frame_src_dir
+        elif packed:
+            data_dir = self.img_frame_pack_dir
+        else:
+            data_dir = self.img_frame_dir
+
+        kwargs = dict(
+            augment=augment,
+            epochs=epochs,
+            img_size=img_size,
+            batch_size=batch_size,
+            validation_split=validation_split,
+            seed=seed,
+            layers=layers
+        )
+        if processes <= 1:
+            for model_name, clf in self.models.items():
+                print(f'{CYAN}==== Training {model_name} ===={END}')
+                clf.train(data_dir=data_dir / model_name, **kwargs)
+            return
 
-        for model_name, clf in self.models.items():
-            print(f'{CYAN}==== Training {model_name} ===={END}')
-            clf.train(
-                data_dir=self.img_frame_dir / model_name,
-                epochs=epochs,
-                img_size=img_size,
-                batch_size=batch_size,
-                validation_split=validation_split,
-                seed=seed,
-                layers=layers
-            )
+        self._train_parallel(data_dir, kwargs, processes, cpu_budget, threads_per_model)
+
+    def _train_parallel(
+            self,
+            data_dir: Path,
+            kwargs: Dict[str, Any],
+            processes: int,
+            cpu_budget: Optional[int] = None,
+            threads_per_model: Optional[int] = None,
+    ) -> None:
+        import multiprocessing
+        import queue as queue_module
+
+        cpu_budget = cpu_budget or os.cpu_count() or 1
+        threads = max(1, min(cpu_budget, threads_per_model or cpu_budget // processes))
+        ctx = multiprocessing.get_context('spawn')
+        progress = ctx.Queue()
+        pending = list(self.models)
+        running: Dict[str, Any] = {}
+        status: Dict[str, str] = {name: 'waiting' for name in pending}
+        failed = []
+
+        def show() -> None:
+            print(end='\r' + ' | '.join(f'{name}: {status[name]}' for name in running) + ' ' * 8)
+
+        print(f'{CYAN}==== Training {len(pending)} models, {processes} at a time, '
+              f'{threads} threads each (budget {cpu_budget}) ===={END}')
+        try:
+            while pending or running:
+                while pending and len(running) < processes and (len(running) + 1) * threads <= cpu_budget:
+                    name = pending.pop(0)
+                    proc = ctx.Process(
+                        target=_train_worker,
+                        args=(name, str(self.models[name].model_path), threads, progress,
+                              {'data_dir': str(data_dir / name), **kwargs}),
+                        daemon=True
+                    )
+                    proc.start()
+                    running[name] = proc
+                    status[name] = 'starting'
+                try:
+                    name, epoch, epochs, logs = progress.get(timeout=1)
+                    if 'error' in logs:
+                        status[name] = logs['error']
+                    else:
+                        acc = logs.get('val_accuracy', logs.get('accuracy', 0.0))
+                        status[name] = f'{epoch}/{epochs} acc={acc:.3f}'
+                    show()
+                except queue_module.Empty:
+                    pass
+                for name, proc in list(running.items()):
+                    if proc.is_alive():
+                        continue
+                    proc.join()
+                    del running[name]
+                    if proc.exitcode == 0:
+                        print(f'\r{GREEN}{name} done ({status[name]}){END}')
+                        self.models[name] = Classifier(self.models[name].model_path)
+                    else:
+                        print(f'\r{RED}{name} failed ({status[name]}, exit code {proc.exitcode}){END}')
+                        failed.append(name)
+        finally:
+            for proc in running.values():
+                proc.terminate()
+        if failed:
+            raise RuntimeError(f"Training failed for: {', '.join(failed)}")
 
     def test_all(
             self,
@@ -512,7 +1175,21 @@ class MultiClassifier:
             contrast_values: Optional[List[float]] = None,
             sharpness_values: Optional[List[float]] = None,
     ):
+        """
+        Classify full images in `data_dir` and compare with their JSON answers.
+        If `data_dir` holds packs per model (`data_dir/<model>/index.json`, as written by
+        `pack_all`), test those instead and return the results per model.
+        """
         data_dir = Path(data_dir)
+        packed = {name: clf for name, clf in self.models.items() if PackedDataset.exists(data_dir / name)}
+        if packed:
+            results = {}
+            for model_name, clf in packed.items():
+                print(f'{CYAN}==== Testing {model_name} ===={END}')
+                results[model_name] = clf.test(data_dir / model_name, threshold=threshold)
+                print(results[model_name])
+            return results
+
         img_paths = sorted({
             f for f in data_dir.glob("*") if f.suffix == '.png'
         }, reverse=True)
@@ -528,7 +1205,7 @@ class MultiClassifier:
             im.image.thumbnail((1366, 768))
 
             draw = im.draw()
-            font = ImageFont.truetype("arial.ttf", 14)
+            font = load_font(14)
 
             clfs = self.classify_all(im)
 
@@ -0,0 +1,297 @@
+"""
+Dataset building helpers for `hexss.image.classifier`.
+
+Everything here works on plain BGR uint8 arrays and does not import TensorFlow,
+so the functions can run in worker processes.
+"""
+import concurrent.futures
+import hashlib
+import json
+from pathlib import Path
+from typing import Union, Optional, Any, Dict, List, Tuple, Iterable
+
+import numpy as np
+import cv2
+
+from hexss.box import Box
+
+# PIL ImageFilter.SMOOTH, the degenerate image used by ImageEnhance.Sharpness
+SMOOTH = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+
+
+def params_hash(params: Any) -> str:
+    """sha1 of a JSON-serializable object."""
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def imwrite(path: Union[Path, str], arr: np.ndarray) -> None:
+    """cv2.imwrite that also works with non-ASCII paths and creates the parent folder."""
+    path = Path(path)
+    ok, buf = cv2.imencode(path.suffix or '.png', arr)
+    if not ok:
+        raise IOError(f"Failed to encode image: {path}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(buf.tobytes())
+
+
+def crop(arr: np.ndarray, xyxy: Iterable[float]) -> np.ndarray:
+    """
+    Crop like PIL's Image.crop: coordinates are rounded, outside pixels are black.
+    """
+    x1, y1, x2, y2 = (int(round(v)) for v in xyxy)
+    h, w = arr.shape[:2]
+    out = np.zeros((max(0, y2 - y1), max(0, x2 - x1), *arr.shape[2:]), dtype=arr.dtype)
+    sx1, sy1, sx2, sy2 = max(x1, 0), max(y1, 0), min(x2, w), min(y2, h)
+    if sx2 > sx1 and sy2 > sy1:
+        out[sy1 - y1:sy2 - y1, sx1 - x1:sx2 - x1] = arr[sy1:sy2, sx1:sx2]
+    return out
+
+
+def brightness_lut(factor: float) -> np.ndarray:
+    """Point-op table equal to ImageEnhance.Brightness(factor)."""
+    return np.clip(np.arange(256) * factor + 0.5, 0, 255).astype(np.uint8)
+
+
+def contrast_lut(mean: int, factor: float) -> np.ndarray:
+    """Point-op table equal to ImageEnhance.Contrast(factor) for an image with grey mean `mean`."""
+    return np.clip(mean + (np.arange(256) - mean) * factor + 0.5, 0, 255).astype(np.uint8)
+
+
+def grey_mean(arr: np.ndarray) -> int:
+    """Mean of the 'L' (ITU-R 601-2) conversion, rounded the way ImageEnhance.Contrast does."""
+    return int(cv2.cvtColor(arr, cv2.COLOR_BGR2GRAY).mean() + 0.5)
+
+
+def sharpness(arr: np.ndarray, factor: float) -> np.ndarray:
+    """Same as ImageEnhance.Sharpness(factor): blend with the smoothed image, borders untouched."""
+    if factor == 1.0:
+        return arr
+    smooth = cv2.filter2D(arr, cv2.CV_32F, SMOOTH, borderType=cv2.BORDER_REPLICATE)
+    out = np.clip(smooth + (arr - smooth) * factor + 0.5, 0, 255).astype(np.uint8)
+    out[[0, -1]] = arr[[0, -1]]
+    out[:, [0, -1]] = arr[:, [0, -1]]
+    return out
+
+
+def _load_source(task: Dict[str, Any]) -> Tuple[str, Dict[str, str], Optional[np.ndarray]]:
+    """
+    Read the PNG/JSON pair of `task` once. The image is None (not decoded) when the
+    content hash equals `previous_hash`; otherwise the previous outputs are deleted.
+    """
+    img_bytes = Path(task['img_path']).read_bytes()
+    json_bytes = Path(task['json_path']).read_bytes()
+    source_hash = hashlib.sha1(img_bytes + json_bytes).hexdigest()
+    if source_hash == task.get('previous_hash'):
+        return source_hash, {}, None
+    frames_status = json.loads(json_bytes.decode('utf-8'))
+    im = cv2.imdecode(np.frombuffer(img_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if im is None:
+        raise ValueError("cannot decode image")
+    for path in task.get('previous_outputs') or []:
+        Path(path).unlink(missing_ok=True)
+    return source_hash, frames_status, im
+
+
+def _task_frames(task: Dict[str, Any], frames_status: Dict[str, str]) -> Iterable[Tuple[str, str, Dict[str, Any]]]:
+    for frame_name, status in frames_status.items():
+        frame = task['frames'].get(frame_name)
+        if frame is not None and frame['model'] in task['models']:
+            yield frame_name, status, frame
+
+
+def render_sources(task: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[List[str]], Optional[str]]:
+    """
+    Save one crop per frame with `task['margin']` pixels of context around it, to
+    `img_frame_src_dir/<model>/<status>/<file_name>!<frame_name>.png`.
+    Same task/return conventions as `render_variants`.
+    """
+    file_name = task['file_name']
+    try:
+        source_hash, frames_status, im = _load_source(task)
+    except Exception as e:
+        return file_name, None, [], f"Error loading {file_name}: {e}"
+    if im is None:
+        return file_name, source_hash, None, None
+
+    H, W = im.shape[:2]
+    m = task['margin']
+    written = []
+    for frame_name, status, frame in _task_frames(task, frames_status):
+        x1, y1, x2, y2 = Box(size=(W, H), xywhn=frame['xywhn']).xyxy
+        path = Path(task['img_frame_src_dir']) / frame['model'] / status / f"{file_name}!{frame_name}.png"
+        imwrite(path, crop(im, (x1 - m, y1 - m, x2 + m, y2 + m)))
+        written.append(str(path))
+    return file_name, source_hash, written, None
+
+
+def render_variants(task: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[List[str]], Optional[str]]:
+    """
+    Crop and augment every frame of one full image, for all models at once.
+
+    `task` keys: file_name, img_path, json_path, frames, models, img_size,
+    shift_values, brightness_values, contrast_values, sharpness_values,
+    img_frame_dir, img_frame_log_dir, and optionally previous_hash / previous_outputs
+    from the manifest of the last run.
+
+    Returns (file_name, content hash, written paths, error message). Written paths
+    are None when the content hash equals `previous_hash` (nothing to do).
+    """
+    file_name = task['file_name']
+    try:
+        source_hash, frames_status, im = _load_source(task)
+    except Exception as e:
+        return file_name, None, [], f"Error loading {file_name}: {e}"
+    if im is None:
+        return file_name, source_hash, None, None
+
+    H, W = im.shape[:2]
+    img_size = tuple(task['img_size'])
+    written = []
+    for frame_name, status, frame in _task_frames(task, frames_status):
+        model_name = frame['model']
+        variant_dir = Path(task['img_frame_dir']) / model_name / status
+
+        xywhn = frame['xywhn']
+        log_path = Path(task['img_frame_log_dir']) / model_name / f"{status}_{frame_name}_{file_name}.png"
+        imwrite(log_path, crop(im, Box(size=(W, H), xywhn=xywhn).xyxy))
+        written.append(str(log_path))
+
+        for sx in task['shift_values']:
+            for sy in task['shift_values']:
+                box = Box(size=(W, H), xywhn=xywhn).move(sx, sy, normalized=False)
+                im_crop = cv2.resize(crop(im, box.xyxy), img_size, interpolation=cv2.INTER_CUBIC)
+                for sharp in task['sharpness_values']:
+                    im_sharp = sharpness(im_crop, sharp)
+                    for b in task['brightness_values']:
+                        im_bright = cv2.LUT(im_sharp, brightness_lut(b)) if b != 1.0 else im_sharp
+                        mean = grey_mean(im_bright)
+                        for c in task['contrast_values']:
+                            im_variant = cv2.LUT(im_bright, contrast_lut(mean, c)) if c != 1.0 else im_bright
+                            path = variant_dir / f"{file_name}!{frame_name}!{status}!{sx}!{sy}!{b}!{c}!{sharp}.png"
+                            imwrite(path, im_variant)
+                            written.append(str(path))
+    return file_name, source_hash, written, None
+
+
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.bmp', '.gif'}
+
+
+def _read_rgb(path: str, img_size: Tuple[int, int]) -> np.ndarray:
+    arr = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if arr is None:
+        raise ValueError(f"cannot decode image: {path}")
+    return cv2.cvtColor(cv2.resize(arr, img_size), cv2.COLOR_BGR2RGB)
+
+
+def pack_dataset(
+        data_dir: Union[Path, str],
+        out_dir: Union[Path, str],
+        img_size: Tuple[int, int],
+        shard_size: int = 4096,
+        seed: Optional[int] = 123,
+        max_workers: Optional[int] = None,
+) -> 'PackedDataset':
+    """
+    Pack `data_dir/<class_name>/*` images into a few large shards under `out_dir`:
+    `images-00000.npy` (N, H, W, 3) RGB uint8 resized to `img_size` (W, H),
+    `labels-00000.npy` (N,) class indices, and `index.json`.
+
+    Samples are shuffled with `seed` at pack time (None keeps folder order), so a
+    validation split is a contiguous range and every epoch reads the shards sequentially.
+    """
+    data_dir, out_dir = Path(data_dir), Path(out_dir)
+    img_size = (int(img_size[0]), int(img_size[1]))
+    class_names = sorted(d.name for d in data_dir.iterdir() if d.is_dir())
+    paths, labels = [], []
+    for i, name in enumerate(class_names):
+        for f in sorted((data_dir / name).iterdir()):
+            if f.suffix.lower() in IMAGE_SUFFIXES:
+                paths.append(str(f))
+                labels.append(i)
+    if seed is not None:
+        order = np.random.RandomState(seed).permutation(len(paths))
+        paths, labels = [paths[i] for i in order], [labels[i] for i in order]
+
+    for old in out_dir.glob('*-*.npy'):
+        old.unlink()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    shards = []
+    W, H = img_size
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        for start in range(0, len(paths), shard_size):
+            stop = min(start + shard_size, len(paths))
+            n = len(shards)
+            images = np.lib.format.open_memmap(
+                out_dir / f'images-{n:05d}.npy', mode='w+', dtype=np.uint8, shape=(stop - start, H, W, 3)
+            )
+            for i, arr in enumerate(executor.map(_read_rgb, paths[start:stop], [img_size] * (stop - start))):
+                images[i] = arr
+            images.flush()
+            del images
+            np.save(out_dir / f'labels-{n:05d}.npy', np.array(labels[start:stop], dtype=np.int32))
+            shards.append({'images': f'images-{n:05d}.npy', 'labels': f'labels-{n:05d}.npy', 'count': stop - start})
+            print(end=f'\rPacked {stop}/{len(paths)}')
+    print()
+
+    index = {'class_names': class_names, 'img_size': list(img_size), 'count': len(paths),
+             'shards': shards, 'paths': paths}
+    (out_dir / 'index.json').write_text(json.dumps(index, indent=2), encoding='utf-8')
+    return PackedDataset(out_dir)
+
+
+class PackedDataset:
+    """
+    Read side of `pack_dataset`. Shards are memory-mapped and read in order.
+    """
+
+    def __init__(self, path: Union[Path, str]) -> None:
+        self.path = Path(path)
+        index = json.loads((self.path / 'index.json').read_text(encoding='utf-8'))
+        self.class_names: List[str] = index['class_names']
+        self.img_size: Tuple[int, int] = tuple(index['img_size'])
+        self.paths: List[str] = index['paths']
+        self.shards: List[Dict[str, Any]] = index['shards']
+        self._images: List[Optional[np.ndarray]] = [None] * len(self.shards)
+        self.labels = np.concatenate([
+            np.load(self.path / s['labels']) for s in self.shards
+        ]) if self.shards else np.zeros(0, dtype=np.int32)
+        self.offsets = np.cumsum([0] + [s['count'] for s in self.shards])
+
+    @staticmethod
+    def exists(path: Union[Path, str]) -> bool:
+        return (Path(path) / 'index.json').is_file()
+
+    def images(self, shard: int) -> np.ndarray:
+        if self._images[shard] is None:
+            self._images[shard] = np.load(self.path / self.shards[shard]['images'], mmap_mode='r')
+        return self._images[shard]
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def iter_batches(
+            self,
+            batch_size: int,
+            start: int = 0,
+            stop: Optional[int] = None
+    ) -> Iterable[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yield (images, labels) for samples [start, stop) in order. Batches that do not
+        cross a shard boundary are views of the memory map.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        pos = start
+        while pos < stop:
+            end = min(pos + batch_size, stop)
+            parts = []
+            p = pos
+            while p < end:
+                shard = int(np.searchsorted(self.offsets, p, side='right')) - 1
+                q = min(end, int(self.offsets[shard + 1]))
+                parts.append(self.images(shard)[p - self.offsets[shard]:q - self.offsets[shard]])
+                p = q
+            yield (parts[0] if len(parts) == 1 else np.concatenate(parts)), self.labels[pos:end]
+            pos = end
+
+    def __repr__(self) -> str:
+        return f"<PackedDataset path={self.path} n={len(self)} classes={self.class_names}>"
@@ -1,8 +1,13 @@
+import concurrent.futures
+import queue
+import threading
 from pathlib import Path
-from typing import Union, Optional, List, Dict
+from time import perf_counter
+from typing import Any, Union, Optional, List, Dict, Iterable, Iterator, Tuple
 import hexss
 from hexss.box import Box
-from hexss.image import Image
+from hexss.box.detections import BaseDetections
+from hexss.image import Image, load_font
 from PIL import Image as PILImage, ImageFont
 import numpy as np
 
@@ -13,9 +18,36 @@ except ImportError:
     from ultralytics import YOLO
 
 
+def _nms(xyxy: np.ndarray, scores: np.ndarray, cls: np.ndarray, iou_thresh: float) -> np.ndarray:
+    """
+    Class-aware non-maximum suppression, returns indices of kept boxes (best score first).
+    """
+    if len(xyxy) == 0:
+        return np.zeros(0, dtype=int)
+    # shift every class to its own region so boxes of different classes never overlap
+    # (by the full coordinate span, since boxes may extend past the frame into negatives)
+    boxes = xyxy + (cls * (xyxy.max() - xyxy.min() + 1))[:, None]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        x1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thresh]
+    return np.array(keep, dtype=int)
+
+
 class Detection:
     def __init__(self, idx: int, name: str, conf: float,
-                 xywhn: np.ndarray, xywh: np.ndarray, xyxyn: np.ndarray, xyxy: np.ndarray, box: Box):
+                 xywhn: np.ndarray, xywh: np.ndarray, xyxyn: np.ndarray, xyxy: np.ndarray,
+                 box: Optional[Box] = None, size: Optional[Tuple[int, int]] = None):
         """
         Args:
             idx (int): Index of the detected class.
@@ -25,7 +57,8 @@ class Detection:
             xywh (np.ndarray): Bounding box in pixel (x, y, width, height) format.
             xyxyn (np.ndarray): Bounding box in normalized (x1, y1, x2, y2) format.
             xyxy (np.ndarray): Bounding box in pixel (x1, y1, x2, y2) format.
-            box (Box): Box object representing the bounding box.
+            box (Box): Box object representing the bounding box, built from `xywhn` and `size` if omitted.
+            size (Tuple[int, int]): (W, H) of the source image.
         """
         self.idx = idx
         self.name = name
@@ -34,8 +67,48 @@ class Detection:
         self.xywh = xywh
         self.xyxyn = xyxyn
         self.xyxy = xyxy
-        self.image: Optional[Image] = None
-        self.box = box
+        self.size = size
+        self._box = box
+        self._image: Optional[Image] = None
+        self._source: Union[PILImage.Image, np.ndarray, None] = None
+
+    @property
+    def box(self) -> Box:
+        if self._box is None:
+            self._box = Box(size=self.size, xywhn=self.xywhn)
+        return self._box
+
+    @box.setter
+    def box(self, box: Box) -> None:
+        self._box = box
+
+    @staticmethod
+    def _crop(image: Union[PILImage.Image, np.ndarray], xyxy: np.ndarray) -> Image:
+        if isinstance(image, np.ndarray):
+            x1, y1, x2, y2 = map(int, xyxy)
+            return Image(image[y1:y2, x1:x2])
+        return Image(image.crop(xyxy.tolist()))
+
+    @property
+    def image(self) -> Optional[Image]:
+        """
+        Crop of the detection, made from the source frame on first access.
+        """
+        if self._image is None and self._source is not None:
+            self._image = self._crop(self._source, self.xyxy)
+        return self._image
+
+    @image.setter
+    def image(self, image: Optional[Image]) -> None:
+        self._image = image
+
+    def set_source(self, image: Union[PILImage.Image, np.ndarray]) -> None:
+        """
+        Keep a reference to the source frame; `image` is cropped from it lazily.
+        The frame is shared, so it should not be modified while crops are still wanted.
+        """
+        self._source = image
+        self._image = None
 
     def set_image(self, image: Union[PILImage.Image, np.ndarray], xyxy: np.ndarray) -> None:
         """
@@ -45,11 +118,33 @@ class Detection:
             image (Union[PILImage.Image, np.ndarray]): Original image.
             xyxy (np.ndarray): Bounding box in pixel (x1, y1, x2, y2) format.
         """
-        if isinstance(image, np.ndarray):
-            x1, y1, x2, y2 = map(int, xyxy)
-            self.image = Image(image[y1:y2, x1:x2])
-        else:
-            self.image = Image(image.crop(xyxy.tolist()))
+        self._image = self._crop(image, xyxy)
+
+
+class Detections(BaseDetections):
+    """
+    Columnar detections (see `BaseDetections`) whose items are `Detection` objects
+    cropping lazily from the source frame.
+    """
+    __slots__ = ()
+
+    def _item(self, i: int) -> Detection:
+        detection = Detection(
+            idx=int(self.cls[i]),
+            name=self.class_names[self.cls[i]],
+            conf=float(self.conf[i]),
+            xywhn=self.xywhn[i],
+            xywh=self.xywh[i],
+            xyxyn=self.xyxyn[i],
+            xyxy=self.xyxy[i],
+            size=self.size
+        )
+        detection.set_source(self._source)
+        return detection
+
+    def crops(self) -> List[Image]:
+        """Crop every detection from the source frame."""
+        return [detection.image for detection in self]
 
 
 class Detector:
@@ -77,44 +172,238 @@ class Detector:
         self.model.to(device)
         self.class_names: List[str] = list(self.model.names.values())  # {0: 'person', 1: 'bicycle', 2: 'car', ...}
         self.counts: Dict[int, int] = {}
-        self.detections: List[Detection] = []
+        self.detections: Detections = Detections.empty(self.class_names)
+        self.tile_stats: Dict[str, Any] = {}  # stats of the last `detect_tiled` call
 
-    def detect(self, image: Union[Image, PILImage.Image, np.ndarray]) -> List[Detection]:
+    @staticmethod
+    def _source(image: Union[Image, PILImage.Image, np.ndarray, str, Path]) -> Union[PILImage.Image, np.ndarray]:
         if isinstance(image, Image):
-            image = image.image
+            return image.image
         elif isinstance(image, PILImage.Image):
-            pass
+            return image
         elif isinstance(image, np.ndarray):
-            pass
-        else:
-            raise TypeError(
-                f"Unsupported image type: {type(image)}. Supported types: hexss.Image, PIL.Image, np.ndarray.")
+            return image
+        elif isinstance(image, (str, Path)):
+            return Image(image).image
+        raise TypeError(
+            f"Unsupported image type: {type(image)}. Supported types: hexss.Image, PIL.Image, np.ndarray, path.")
 
+    def _to_detections(self, result, image: Union[PILImage.Image, np.ndarray]) -> Detections:
+        # one device->host transfer per attribute instead of one per box
+        boxes = result.boxes
+        return Detections(
+            cls=boxes.cls.cpu().numpy(),
+            conf=boxes.conf.cpu().numpy(),
+            xyxy=boxes.xyxy.cpu().numpy(),
+            size=result.orig_shape[::-1],
+            class_names=self.class_names,
+            source=image
+        )
+
+    def _remember(self, detections: Detections) -> Detections:
+        self.detections = detections
+        self.counts = {i: int(n) for i, n in enumerate(detections.counts) if n}  # {0: 40, 1: 30, 2: 10}
+        return detections
+
+    def detect(self, image: Union[Image, PILImage.Image, np.ndarray]) -> Detections:
+        image = self._source(image)
         result = self.model(source=image, verbose=False)[0]
+        return self._remember(self._to_detections(result, image))
 
-        self.detections.clear()
-        counts: Dict[int, int] = {}
-        boxes = result.boxes
-        for cls, conf, xywhn, xywh, xyxyn, xyxy in zip(
-                boxes.cls, boxes.conf, boxes.xywhn, boxes.xywh, boxes.xyxyn, boxes.xyxy
-        ):
-            cls_int = int(cls)
-            counts[cls_int] = counts.get(cls_int, 0) + 1
-            detection = Detection(
-                idx=cls_int,
-                name=self.class_names[cls_int],
-                conf=float(conf),
-                xywhn=xywhn.cpu().numpy(),
-                xywh=xywh.cpu().numpy(),
-                xyxyn=xyxyn.cpu().numpy(),
-                xyxy=xyxy.cpu().numpy(),
-                box=Box(size=result.orig_shape[::-1], xywhn=xywhn.cpu().numpy())
-            )
-
-            detection.set_image(image, xyxy)
-            self.detections.append(detection)
-            self.counts = counts  # {0: 40, 1: 30, 2: 10}
-        return self.detections
+    def detect_batch(self, images: List[Union[Image, PILImage.Image, np.ndarray]]) -> List[Detections]:
+        """
+        Detect on several frames with one model call.
+        `self.detections` and `self.counts` refer to the last frame.
+        """
+        if not images:
+            return []
+        images = [self._source(image) for image in images]
+        results = self.model(source=images, verbose=False)
+        batch = [self._to_detections(result, image) for result, image in zip(results, images)]
+        self._remember(batch[-1])
+        return batch
+
+    def detect_tiled(
+            self,
+            image: Union[Image, PILImage.Image, np.ndarray],
+            tile_size: Union[int, Tuple[int, int]] = 640,
+            overlap: float = 0.2,
+            batch_size: int = 8,
+            iou_thresh: Optional[float] = None,
+            full_frame: bool = False,
+            max_workers: Optional[int] = None,
+            verbose: bool = False
+    ) -> Detections:
+        """
+        Sliced inference for small objects on large frames.
+
+        The frame is cut into overlapping tiles (prepared in a thread pool) that go
+        through the model `batch_size` at a time. Boxes are shifted back to frame
+        coordinates and duplicates from the overlaps are merged with class-aware NMS.
+
+        Args:
+            image: Frame to detect on.
+            tile_size: Tile width/height in pixels, or (width, height).
+            overlap: Overlap between neighbouring tiles as a fraction of the tile size.
+            batch_size: Number of tiles per model call.
+            iou_thresh: IoU for merging duplicates, defaults to the model's `iou`.
+            full_frame: Also run the whole (downscaled) frame, for objects larger than a tile.
+            max_workers: Threads used to prepare tiles.
+            verbose: Print `self.tile_stats`.
+        """
+        if not (0.0 <= overlap < 1.0):
+            raise ValueError("overlap must be in [0, 1)")
+        source = self._source(image)
+        if isinstance(source, np.ndarray):
+            W, H = source.shape[1], source.shape[0]
+        else:
+            W, H = source.size
+        tw, th = (tile_size, tile_size) if isinstance(tile_size, int) else tile_size
+        tiles = [Box(size=(W, H), xyxy=xyxy) for xyxy in self._tile_grid(W, H, tw, th, overlap)]
+
+        def prepare(tile: Box):
+            x1, y1, x2, y2 = map(int, tile.xyxy)
+            if isinstance(source, np.ndarray):
+                return np.ascontiguousarray(source[y1:y2, x1:x2])
+            return source.crop((x1, y1, x2, y2))
+
+        t0 = perf_counter()
+        cls, conf, xyxy = [], [], []
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            batches = [tiles[i:i + batch_size] for i in range(0, len(tiles), batch_size)]
+            # keep the next batch cropping while the model runs the current one
+            pending = [executor.submit(prepare, tile) for tile in batches[0]] if batches else []
+            for i, batch in enumerate(batches):
+                crops = [future.result() for future in pending]
+                if i + 1 < len(batches):
+                    pending = [executor.submit(prepare, tile) for tile in batches[i + 1]]
+                for tile, result in zip(batch, self.model(source=crops, verbose=False)):
+                    boxes = result.boxes
+                    cls.append(boxes.cls.cpu().numpy().astype(int))
+                    conf.append(boxes.conf.cpu().numpy())
+                    xyxy.append(boxes.xyxy.cpu().numpy() + np.tile(tile.x1y1.astype(int), 2))
+
+        if full_frame:
+            boxes = self.model(source=source, verbose=False)[0].boxes
+            cls.append(boxes.cls.cpu().numpy().astype(int))
+            conf.append(boxes.conf.cpu().numpy())
+            xyxy.append(boxes.xyxy.cpu().numpy())
+
+        cls = np.concatenate(cls) if cls else np.zeros(0, dtype=int)
+        conf = np.concatenate(conf) if conf else np.zeros(0, dtype=np.float32)
+        xyxy = np.concatenate(xyxy) if xyxy else np.zeros((0, 4), dtype=np.float32)
+        before = len(cls)
+
+        iou = self.model.iou if iou_thresh is None else iou_thresh
+        keep = _nms(xyxy, conf, cls, iou)
+        cls, conf, xyxy = cls[keep], conf[keep], xyxy[keep]
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, W)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, H)
+        detections = Detections(cls, conf, xyxy, (W, H), self.class_names, source)
+
+        dt = perf_counter() - t0
+        self.tile_stats = {
+            'tiles': len(tiles),
+            'seconds': dt,
+            'tiles_per_sec': len(tiles) / dt if dt else 0.0,
+            'megapixels_per_sec': W * H / 1e6 / dt if dt else 0.0,
+            'detections_before_nms': before,
+            'detections': len(detections),
+        }
+        if verbose:
+            print(self.tile_stats)
+        return self._remember(detections)
+
+    @staticmethod
+    def _tile_grid(W: int, H: int, tw: int, th: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+        def starts(length: int, tile: int) -> List[int]:
+            if length <= tile:
+                return [0]
+            stride = max(1, int(tile * (1.0 - overlap)))
+            out = list(range(0, length - tile, stride))
+            out.append(length - tile)  # last tile flush with the border
+            return out
+
+        return [
+            (x, y, min(x + tw, W), min(y + th, H))
+            for y in starts(H, th)
+            for x in starts(W, tw)
+        ]
+
+    def stream(
+            self,
+            source: Iterable[Union[Image, PILImage.Image, np.ndarray, str, Path]],
+            batch_size: int = 1,
+            prefetch: int = 2
+    ) -> Iterator[Detections]:
+        """
+        Yield the detections of every frame in `source`, in order.
+
+        Frames are decoded on a background thread (up to `prefetch` batches ahead),
+        and post-processing of one batch runs while the model works on the next.
+        """
+        frames = queue.Queue(maxsize=max(1, prefetch) * batch_size)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def decode():
+            try:
+                for item in source:
+                    if not put(self._source(item)):
+                        return
+            except Exception as e:
+                put(e)
+            put(done)
+
+        threading.Thread(target=decode, daemon=True).start()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as post:
+            pending = None
+            finished = False
+            try:
+                while not finished:
+                    batch = []
+                    while len(batch) < batch_size:
+                        item = frames.get()
+                        if item is done:
+                            finished = True
+                            break
+                        if isinstance(item, Exception):
+                            raise item
+                        batch.append(item)
+
+                    future = None
+                    if batch:
+                        results = self.model(source=batch, verbose=False)
+                        future = post.submit(
+                            lambda r, b: [self._to_detections(x, im) for x, im in zip(r, b)], results, batch
+                        )
+                    if pending is not None:
+                        for detections in pending.result():
+                            yield self._remember(detections)
+                    pending = future
+
+                if pending is not None:
+                    for detections in pending.result():
+                        yield self._remember(detections)
+            finally:
+                stop.set()
+
+    def crops(self, detections: Optional[Detections] = None) -> List[Image]:
+        """
+        Crop every detection (default: the last detected frame) in one go.
+        """
+        if detections is None:
+            detections = self.detections
+        return detections.crops()
 
     def draw_boxes(
             self,
@@ -124,10 +413,7 @@ class Detector:
     ) -> PILImage.Image:
         image = Image(image)
         draw = image.draw()
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except IOError:
-            font = ImageFont.load_default(font_size)
+        font = load_font(font_size)
 
         for det in self.detections:
             x1, y1, x2, y2 = map(int, det.xyxy)
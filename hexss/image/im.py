@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pathlib import Path
 from typing import Union, Optional, Tuple, List, Self, IO, Type, Literal, Any, Sequence, Dict
 from io import BytesIO
@@ -22,6 +23,20 @@ Array2 = np.ndarray
 Coord4 = Union[Tuple[float, float, float, float], Sequence[float]]
 
 
+@lru_cache(maxsize=None)
+def load_font(size: float = 14, name: Optional[str] = "arial.ttf") -> ImageFont.FreeTypeFont:
+    """
+    ImageFont.truetype(name, size), falling back to the default font (also used when
+    `name` is None). Loaded once per (size, name).
+    """
+    if name is not None:
+        try:
+            return ImageFont.truetype(name, size)
+        except IOError:
+            pass
+    return ImageFont.load_default(size)
+
+
 class Image:
     """
     A wrapper class for handling images with various sources and operations.
@@ -33,7 +48,7 @@ class Image:
             source: Union[Path, str, bytes, np.ndarray, PILImage.Image],
             session: Optional[requests.Session] = None,
     ) -> None:
-        self._session = session or requests.Session()
+        self._session = session
         # type(self.image) is PIL Image
 
         if isinstance(source, PILImage.Image):
@@ -84,7 +99,7 @@ class Image:
             raise IOError(f"Cannot open image file {source!r}: {e}") from e
 
     def _from_url(self, url: str) -> PILImage.Image:
-        resp = self._session.get(url, timeout=(3.05, 27))
+        resp = (self._session or requests.Session()).get(url, timeout=(3.05, 27))
         resp.raise_for_status()
         try:
             return PILImage.open(BytesIO(resp.content))
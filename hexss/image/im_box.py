@@ -1,8 +1,17 @@
+import concurrent.futures
 from pathlib import Path
-from typing import Union, Optional
+from time import perf_counter
+from typing import Union, Optional, Dict, List, Tuple
+
+import numpy as np
 
 from hexss.box import Box
-from hexss.image import Image, ImageFont
+from hexss.image import Image, PILImage, load_font
+
+
+def change_signature(image: Image, size: Tuple[int, int] = (32, 32)) -> np.ndarray:
+    """Small grayscale thumbnail of `image`, compared by `ImageBox` to skip unchanged regions."""
+    return np.asarray(image.image.resize(size, PILImage.Resampling.BOX).convert('L'), dtype=np.int16)
 
 
 class Models:
@@ -66,9 +75,10 @@ class ImageBox:
         self.text_color = 'black'
         self.text_stroke_color = 'white'
         self.show_name = True
-        self.font = ImageFont.load_default(20)
+        self.font = load_font(20, None)
 
-        self.image = None
+        self._image: Optional[Image] = None
+        self._parent: Optional['ImageBox'] = None
         self.imxes: dict[str, 'ImageBox'] = {}
         self.detector_imxes: list['ImageBox'] = []
 
@@ -79,12 +89,49 @@ class ImageBox:
         self.classifier_name = None
         self.classification = None
 
-    def set_image(self, image: Image):
-        self.image = image
+        self.timing: Dict[str, float] = {}  # seconds per stage of the last predict, e.g. {'crop': .., 'classify': ..}
+
+        # latching: skip classify while the region differs from the last classified crop
+        # by less than `change_threshold` (mean abs difference of change_signature, 0-255)
+        self.change_threshold: Optional[float] = None
+        self.change_score: Optional[float] = None
+        self.latch_stats = {'hits': 0, 'misses': 0}
+        self._change_ref: Optional[np.ndarray] = None
+        self._change_sig: Optional[np.ndarray] = None
+
+    @property
+    def image(self) -> Optional[Image]:
+        """
+        Image of this region. A child's image is cropped from its parent's image on
+        first access after the parent's image changed.
+        """
+        if self._image is None and self._parent is not None:
+            parent_image = self._parent.image
+            if parent_image is not None:
+                self.box.set_size(parent_image.size)
+                self._image = parent_image.crop(self.box).copy()
+        return self._image
+
+    @image.setter
+    def image(self, image: Optional[Image]):
+        self._image = image
+        self._invalidate_children()
+
+    def _invalidate_children(self):
+        for child in [*self.imxes.values(), *self.detector_imxes]:
+            if child._image is not None:
+                child._image = None
+                child._invalidate_children()
+
+    def set_image(self, image: Image, recursive: bool = True):
+        """
+        Set the image of this region. Children are cropped lazily, when their `image` is
+        first used; with `recursive=False` they keep their current images.
+        """
+        self._image = image
         self.box.set_size(image.size)
-        for name, child in self.imxes.items():
-            child.box.set_size(self.box.xywh[2:])
-            child.set_image(image.crop(child.box).copy())
+        if recursive:
+            self._invalidate_children()
 
     def set_components(self, imxes_dict):
         for name, imx_dict in imxes_dict.items():
@@ -92,18 +139,17 @@ class ImageBox:
             imx.classifier_name = (imx_dict.get('classifier') or {}).get('name')
             imx.detector_name = (imx_dict.get('detector') or {}).get('name')
             imx.detector_box_setup = (imx_dict.get('detector') or {}).get('imxes_setup') or {}
+            imx.change_threshold = imx_dict.get('change_threshold')
             self.add_imx(imx)
 
     def add_imx(self, imx: 'ImageBox'):
-        if self.image is not None:
-            imx.box.set_size(self.image.size)
-            imx.image = self.image.crop(imx.box)
+        imx._parent = self
+        imx._image = None
         self.imxes[imx.name] = imx
 
     def add_detector_imx(self, imx: 'ImageBox'):
-        if self.image is not None:
-            imx.box.set_size(self.image.size)
-            imx.image = self.image.crop(imx.box)
+        imx._parent = self
+        imx._image = None
         self.detector_imxes.append(imx)
 
     def reset_detector_imx(self):
@@ -117,10 +163,7 @@ class ImageBox:
     ) -> Image:
         image = Image(image)
         draw = image.draw()
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except IOError:
-            font = ImageFont.load_default(font_size)
+        font = load_font(font_size)
 
         for det in self.detections:
             x1, y1, x2, y2 = map(int, det.xyxy)
@@ -141,10 +184,7 @@ class ImageBox:
             self.set_image(Image(image))
         image = self.image.copy()
         draw = image.draw()
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except IOError:
-            font = ImageFont.load_default(font_size)
+        font = load_font(font_size)
 
         for name, imx in self.imxes.items():
             draw.rectangle(imx.box, outline=color, width=thickness)
@@ -160,9 +200,12 @@ class ImageBox:
             self.detections = []
             return self.detections
 
-        self.detections = models.detectors[model_name].detect(self.image)
+        return self._set_detections(models.detectors[model_name].detect(self.image))
+
+    def _set_detections(self, detections):
+        self.reset_detector_imx()
+        self.detections = detections
         for i, detection in enumerate(self.detections):
-            detection.image = self.image.crop(detection.box).copy()
             imx = ImageBox(f'{i}', Box(xywhn=detection.xywhn))
             imx.classifier_name = (self.detector_box_setup.get('classifier') or {}).get('name')
             imx.detector_name = (self.detector_box_setup.get('detector') or {}).get('name')
@@ -173,8 +216,32 @@ class ImageBox:
     def classify(self, models: Optional[Models], model_name):
         if self.image is None or model_name not in models.classifiers:
             return
-
-        self.classification = models.classifiers[model_name].classify(self.image)
+        if self.latched():
+            return self.classification
+
+        return self._set_classification(models.classifiers[model_name].classify(self.image))
+
+    def latched(self) -> bool:
+        """
+        True if the current image is close enough to the last classified one to keep
+        `classification`; counts a hit or a miss. Always False without `change_threshold`.
+        """
+        if self.change_threshold is None or self.image is None:
+            return False
+        self._change_sig = change_signature(self.image)
+        if self._change_ref is None or self.classification is None:
+            self.change_score = None
+        else:
+            self.change_score = float(np.abs(self._change_sig - self._change_ref).mean())
+            if self.change_score < self.change_threshold:
+                self.latch_stats['hits'] += 1
+                return True
+        self.latch_stats['misses'] += 1
+        return False
+
+    def _set_classification(self, classification):
+        self.classification = classification
+        self._change_ref, self._change_sig = self._change_sig, None
         if self.classification.group == 'OK':
             self.color = 'green'
         elif self.classification.group == 'NG':
@@ -183,9 +250,17 @@ class ImageBox:
             self.color = '#22f'
         return self.classification
 
-    def predict(self, models: Optional[Models] = None):
+    def predict(self, models: Optional[Models] = None, scheduler: Optional['PredictScheduler'] = None):
+        """
+        Run detectors and classifiers over the whole tree.
+
+        Without `scheduler` the tree is walked depth-first, one model call per node.
+        With a `PredictScheduler` the work is batched per tree level and per model.
+        """
         if self.image is None or models is None:
             return
+        if scheduler is not None:
+            return scheduler.run(self, models)
 
         if self.detector_name in models.detectors:
             self.detect(models, self.detector_name)
@@ -204,9 +279,17 @@ class ImageBox:
             self.image.save(path)
 
     def draw_all(self, image: Image) -> Image:
-        draw = image.draw()
-        self.box.set_size(image.size)
+        """
+        Draw this box and all descendants onto `image` in one pass. Child boxes are
+        relative to their parent's region, so each level is drawn with the origin moved
+        to its parent's top-left corner instead of cropping and pasting back.
+        """
+        self._draw_tree(image.draw(), image.size, np.zeros(2))
+        return image
 
+    def _draw_tree(self, draw, size: Tuple[int, int], origin: np.ndarray) -> None:
+        self.box.set_size(size)
+        draw.set_origin(origin)
         if self.box.type == 'polygon':
             draw.polygon(self.box, outline=self.color, width=self.width)
             if self.show_name:
@@ -218,13 +301,11 @@ class ImageBox:
                 draw.text(self.box.x1y1, self.name, font=self.font, fill=self.text_color,
                           stroke_width=self.width, stroke_fill=self.text_stroke_color)
 
-        cropped = image.crop(self.box.xyxy).copy()
-        for child in self.imxes.values():
-            child.draw_all(cropped)
-        for child in self.detector_imxes:
-            child.draw_all(cropped)
-        image.overlay(cropped, self.box.x1y1.astype(int).tolist())
-        return image
+        # same region as Image.crop(self.box.xyxy) pasted back at x1y1.astype(int)
+        x1, y1, x2, y2 = (int(round(v)) for v in self.box.xyxy)
+        child_origin = origin + self.box.x1y1.astype(int)
+        for child in [*self.imxes.values(), *self.detector_imxes]:
+            child._draw_tree(draw, (x2 - x1, y2 - y1), child_origin)
 
     @classmethod
     def from_dict(cls, data: dict) -> 'ImageBox':
@@ -233,6 +314,7 @@ class ImageBox:
                 xywhn=box_data.get('xywhn'),
                 pointsn=box_data.get('pointsn')
             ))
+            box.change_threshold = box_data.get('change_threshold')
 
             image_data = box_data.get('image')
             if image_data is not None:
@@ -263,3 +345,123 @@ class ImageBox:
         for name, box_data in root_data.items():
             root.add_imx(create_box(name, box_data))
         return root
+
+
+class PredictScheduler:
+    """
+    Level-by-level executor for an ImageBox tree.
+
+    Nodes on the same tree level do not depend on each other, so their detector and
+    classifier calls are grouped per model and run as one batch. While the classifiers
+    of one level run, a worker thread crops and preprocesses the next level. Nodes with
+    a `change_threshold` whose region has not changed keep their classification and
+    are left out of the batch.
+    Results and colours on each ImageBox are the same as with the depth-first `ImageBox.predict`.
+
+    example:
+        with PredictScheduler() as scheduler:
+            root.predict(models, scheduler=scheduler)
+            print(root.timing, scheduler.level_timing)
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self.level_timing: List[Dict[str, float]] = []
+        self.latch_stats = {'hits': 0, 'misses': 0}  # over all runs, see ImageBox.change_threshold
+
+    def __enter__(self) -> 'PredictScheduler':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+    def run(self, root: ImageBox, models: Models) -> ImageBox:
+        self.level_timing = []
+        root.timing = {}
+        level = [root] if root.image is not None else []
+        inputs = self._prepare(level, models)
+        while level:
+            t0 = perf_counter()
+            self._detect(level, models)
+            t1 = perf_counter()
+            # crop + preprocess level N+1 while level N is being classified
+            future = self.executor.submit(self._expand, level, models)
+            self._classify(level, models, inputs)
+            t2 = perf_counter()
+            level, inputs = future.result()
+            self.level_timing.append({'detect': t1 - t0, 'classify': t2 - t1, 'wait': perf_counter() - t2})
+        return root
+
+    @staticmethod
+    def _classifier(node: ImageBox, models: Models):
+        classifier = models.classifiers.get(node.classifier_name)
+        if classifier is not None and classifier.model is not None:
+            return classifier
+
+    def _prepare(self, nodes: List[ImageBox], models: Models) -> Dict[ImageBox, np.ndarray]:
+        inputs = {}
+        for node in nodes:
+            classifier = self._classifier(node, models)
+            if classifier is None:
+                continue
+            t0 = perf_counter()
+            if node.latched():
+                self.latch_stats['hits'] += 1
+                node.timing['latched'] = perf_counter() - t0
+                continue
+            if node.change_threshold is not None:
+                self.latch_stats['misses'] += 1
+            inputs[node] = classifier._prepare_image(node.image)
+            node.timing['prepare'] = perf_counter() - t0
+        return inputs
+
+    def _expand(
+            self,
+            level: List[ImageBox],
+            models: Models
+    ) -> Tuple[List[ImageBox], Dict[ImageBox, np.ndarray]]:
+        children = []
+        for node in level:
+            for child in node.detector_imxes:
+                child.timing = {}
+                if child.image is not None:
+                    children.append(child)
+            for child in node.imxes.values():
+                t0 = perf_counter()
+                child.timing = {}
+                child.image  # crop from node.image
+                child.timing['crop'] = perf_counter() - t0
+                children.append(child)
+        return children, self._prepare(children, models)
+
+    def _detect(self, level: List[ImageBox], models: Models) -> None:
+        groups: Dict[str, List[ImageBox]] = {}
+        for node in level:
+            if node.detector_name in models.detectors:
+                groups.setdefault(node.detector_name, []).append(node)
+
+        for model_name, nodes in groups.items():
+            t0 = perf_counter()
+            batch = models.detectors[model_name].detect_batch([node.image for node in nodes])
+            dt = (perf_counter() - t0) / len(nodes)
+            for node, detections in zip(nodes, batch):
+                node._set_detections(detections)
+                node.timing['detect'] = dt
+
+    def _classify(self, level: List[ImageBox], models: Models, inputs: Dict[ImageBox, np.ndarray]) -> None:
+        groups: Dict[str, List[ImageBox]] = {}
+        for node in level:
+            if node in inputs:
+                groups.setdefault(node.classifier_name, []).append(node)
+
+        for model_name, nodes in groups.items():
+            t0 = perf_counter()
+            batch = np.concatenate([inputs[node] for node in nodes])
+            classifications = models.classifiers[model_name]._classify_prepared(batch)
+            dt = (perf_counter() - t0) / len(nodes)
+            for node, classification in zip(nodes, classifications):
+                node._set_classification(classification)
+                node.timing['classify'] = dt
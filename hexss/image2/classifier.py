@@ -3,7 +3,7 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 from pprint import pprint
-from typing import Union, Optional, Any, Dict, List, Tuple, Self
+from typing import Union, Optional, Any, Dict, List, Tuple, Sequence, Self
 import concurrent.futures
 
 import hexss
@@ -11,7 +11,7 @@ from hexss import json_load, json_dump, json_update
 from hexss import Config
 from hexss.constants import *
 from hexss.path import shorten
-from hexss.image import Image, ImageFont, PILImage
+from hexss.image2 import Image
 import numpy as np
 import cv2
 import matplotlib.pyplot as plt
@@ -129,50 +129,75 @@ model = Sequential([
         else:
             print(f"Warning: Model file {self.model_path} not found. Train with .train()")
 
-    def _prepare_image(
+    def _prepare_batch(
             self,
-            im: Union[Image, PILImage.Image, np.ndarray]
+            ims: Sequence[Union[Image, np.ndarray]],
+            rois: Optional[Sequence[Optional[Sequence[int]]]] = None
     ) -> np.ndarray:
         """
-        Convert input to RGB array resized to `img_size` and batch of 1.
+        Resize each image (or its pixel ROI `(x1, y1, x2, y2)`) straight into one
+        preallocated (N, H, W, 3) RGB uint8 batch; the BGR -> RGB swap is done in place.
         """
-        if isinstance(im, Image):
-            arr = im.numpy('RGB')
-        elif isinstance(im, PILImage.Image):
-            arr = np.array(im.convert('RGB'))
-        elif isinstance(im, np.ndarray):
-            if im.ndim == 2 or (im.ndim == 3 and im.shape[2] == 1):
-                arr = cv2.cvtColor(im, cv2.COLOR_GRAY2RGB)
+        w, h = self.cfg.img_size
+        batch = np.empty((len(ims), h, w, 3), dtype=np.uint8)
+        for i, im in enumerate(ims):
+            arr = im.im if isinstance(im, Image) else im
+            if not isinstance(arr, np.ndarray):
+                raise TypeError(f"Unsupported image type: {type(im)}")
+            roi = rois[i] if rois is not None else None
+            if roi is not None:
+                x1, y1, x2, y2 = (int(round(v)) for v in roi)
+                arr = arr[max(y1, 0):y2, max(x1, 0):x2]
+            out = batch[i]
+            if arr.ndim == 2 or arr.shape[2] == 1:
+                cv2.cvtColor(cv2.resize(arr, (w, h)), cv2.COLOR_GRAY2RGB, dst=out)
+            elif arr.shape[2] == 4:
+                cv2.cvtColor(cv2.resize(arr, (w, h)), cv2.COLOR_BGRA2RGB, dst=out)
             else:
-                arr = cv2.cvtColor(im, cv2.COLOR_BGR2RGB)
-        else:
-            raise TypeError(f"Unsupported image type: {type(im)}")
-
-        arr = cv2.resize(arr, self.cfg.img_size)
-        if arr.shape[2] == 4:
-            arr = arr[..., :3]
+                cv2.resize(arr, (w, h), dst=out)
+                cv2.cvtColor(out, cv2.COLOR_BGR2RGB, dst=out)
+        return batch
 
-        return np.expand_dims(arr, axis=0)
+    def _prepare_image(self, im: Union[Image, np.ndarray]) -> np.ndarray:
+        """
+        Convert input to RGB array resized to `img_size` and batch of 1.
+        """
+        return self._prepare_batch([im])
 
     def classify(
             self,
-            im: Union[Image, PILImage.Image, np.ndarray],
+            im: Union[Image, np.ndarray],
             mapping: Optional[Dict[str, List[str]]] = None,
-            xywhn=None
+            xywhn=None,
+            roi: Optional[Sequence[int]] = None
     ) -> Classification:
         """
-        Run a forward pass and return a Classification.
+        Run a forward pass and return a Classification. `roi` is a pixel `(x1, y1, x2, y2)`
+        region of `im` to classify, read in place without cropping a copy.
+        """
+        return self.classify_batch([im], mapping=mapping, xywhn=[xywhn], rois=[roi])[0]
+
+    def classify_batch(
+            self,
+            ims: Sequence[Union[Image, np.ndarray]],
+            mapping: Optional[Dict[str, List[str]]] = None,
+            xywhn: Optional[List[Any]] = None,
+            rois: Optional[Sequence[Optional[Sequence[int]]]] = None
+    ) -> List[Classification]:
+        """
+        Classify several images (or ROIs of them, e.g. the same frame repeated with
+        different `rois`) with a single forward pass.
         """
         if self.model is None:
             raise ValueError("Model is not loaded. Call train() or load an existing model.")
-        batch = self._prepare_image(im)
-        preds = self.model.predict(batch, verbose=0)[0]
-        return Classification(
-            predictions=preds,
-            class_names=self.class_names,
-            mapping=mapping,
-            xywhn=xywhn
-        )
+        if not ims:
+            return []
+        preds = self.model.predict(self._prepare_batch(ims, rois), verbose=0)
+        xywhn = xywhn or [None] * len(preds)
+        return [
+            Classification(predictions=p, class_names=self.class_names, mapping=mapping, xywhn=xy)
+            for p, xy in zip(preds, xywhn)
+        ]
 
     def predict(self, *args, **kwargs):
         return self.classify(*args, **kwargs)
@@ -278,7 +303,7 @@ model = Sequential([
         results = []
 
         def _test_one(class_name: str, img_path: Path, i: int, total: int) -> str:
-            im = Image.open(img_path)
+            im = Image.from_file(img_path)
             clf = self.classify(im)
             prob = clf.expo_preds(1.2)[clf.idx]
             is_match = (clf.name == class_name)
@@ -2,6 +2,7 @@ from pathlib import Path
 from typing import Optional, List
 import hexss
 from hexss.image2 import Image
+from hexss.box.detections import BaseDetections
 import numpy as np
 
 try:
@@ -34,6 +35,24 @@ class Detection:
         self.image: Optional[Image] = None
 
 
+class Detections(BaseDetections):
+    """
+    Columnar detections (see `BaseDetections`) whose items are `Detection` objects.
+    """
+    __slots__ = ()
+
+    def _item(self, i: int) -> Detection:
+        return Detection(
+            class_index=int(self.cls[i]),
+            class_name=self.class_names[self.cls[i]],
+            confidence=float(self.conf[i]),
+            xywhn=self.xywhn[i],
+            xywh=self.xywh[i],
+            xyxyn=self.xyxyn[i],
+            xyxy=self.xyxy[i]
+        )
+
+
 class Detector:
     def __init__(
             self,
@@ -59,33 +78,13 @@ class Detector:
         self.model.to(device)
         self.class_names: List[str] = list(self.model.names.values())  # {0: 'person', 1: 'bicycle', 2: 'car', ...}
 
-    def detect(self, image: Image) -> List[Detection]:
-        detections = []
+    def detect(self, image: Image) -> Detections:
         result = self.model(source=image.im, verbose=False)[0]
         boxes = result.boxes
-        for cls, conf, xywhn, xywh, xyxyn, xyxy in zip(
-                boxes.cls, boxes.conf, boxes.xywhn, boxes.xywh, boxes.xyxyn, boxes.xyxy
-        ):
-            cls_int = int(cls)
-            if self.model.device == "cpu":
-                detection = Detection(
-                    class_index=cls_int,
-                    class_name=self.class_names[cls_int],
-                    confidence=float(conf),
-                    xywhn=xywhn.cpu().numpy(),
-                    xywh=xywh.cpu().numpy(),
-                    xyxyn=xyxyn.cpu().numpy(),
-                    xyxy=xyxy.cpu().numpy()
-                )
-            else:
-                detection = Detection(
-                    class_index=cls_int,
-                    class_name=self.class_names[cls_int],
-                    confidence=float(conf),
-                    xywhn=xywhn.numpy(),
-                    xywh=xywh.numpy(),
-                    xyxyn=xyxyn.numpy(),
-                    xyxy=xyxy.numpy()
-                )
-            detections.append(detection)
-        return detections
+        return Detections(
+            cls=boxes.cls.cpu().numpy(),
+            conf=boxes.conf.cpu().numpy(),
+            xyxy=boxes.xyxy.cpu().numpy(),
+            size=result.orig_shape[::-1],
+            class_names=self.class_names
+        )
@@ -1,8 +1,10 @@
 import json
+import multiprocessing
 import platform
+import threading
 import time
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional, Tuple
 from datetime import datetime
 
 import hexss
@@ -16,6 +18,7 @@ else:
 from hexss.config import load_config, update_config
 from hexss.network import get_all_ipv4, close_port
 from hexss.threading import Multithread
+from hexss.frame_publisher.shm import ShmRingWriter, ShmRingReader
 import numpy as np
 import cv2
 from flask import Flask, render_template, Response, request, redirect, url_for, current_app
@@ -29,6 +32,72 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 
 
+class FrameSlot:
+    """
+    Latest frame of a capture loop as one (seq, ts, frame) tuple, replaced atomically; `ts`
+    is time.monotonic() at capture and `frame` is None while the source fails. Readers
+    block in `wait_newer` until a seq newer than the one they have is put.
+    """
+    __slots__ = ('_cond', '_value')
+
+    def __init__(self, frame: Optional[np.ndarray] = None) -> None:
+        self._cond = threading.Condition()
+        self._value: Tuple[int, float, Optional[np.ndarray]] = (0, time.monotonic(), frame)
+
+    def put(self, frame: Optional[np.ndarray]) -> int:
+        with self._cond:
+            seq = self._value[0] + 1
+            self._value = (seq, time.monotonic(), frame)
+            self._cond.notify_all()
+        return seq
+
+    def get(self) -> Tuple[int, float, Optional[np.ndarray]]:
+        return self._value
+
+    @property
+    def seq(self) -> int:
+        return self._value[0]
+
+    def wait_newer(self, seq: int, timeout: Optional[float] = None) -> Tuple[int, float, Optional[np.ndarray]]:
+        """The slot's value once its seq is greater than `seq`, or the current value after `timeout`."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._value[0] > seq, timeout)
+            return self._value
+
+
+class FrameSignal:
+    """
+    Cross-process counterpart of FrameSlot for multiprocess mode, without the frame itself
+    (that goes through the shm ring): the capture process `publish`es the seq and status of
+    each frame, and web threads block in `wait_newer` instead of polling the ring.
+    """
+
+    def __init__(self) -> None:
+        self._cond = multiprocessing.Condition()
+        self._seq = multiprocessing.Value('Q', 0, lock=False)
+        self._ok = multiprocessing.Value('b', 0, lock=False)
+
+    def publish(self, seq: int, ok: bool) -> None:
+        with self._cond:
+            self._seq.value = seq
+            self._ok.value = ok
+            self._cond.notify_all()
+
+    @property
+    def seq(self) -> int:
+        return self._seq.value
+
+    @property
+    def ok(self) -> bool:
+        return bool(self._ok.value)
+
+    def wait_newer(self, seq: int, timeout: Optional[float] = None) -> Tuple[int, bool]:
+        """(seq, ok) once the published seq differs from `seq`, or the current one after `timeout`."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq.value != seq, timeout)
+            return self._seq.value, bool(self._ok.value)
+
+
 def display_capture(data: Dict[str, Any]) -> None:
     if platform.system() != "Windows":
         logger.warning("Display capture is only supported on Windows.")
@@ -38,16 +107,28 @@ def display_capture(data: Dict[str, Any]) -> None:
             try:
                 screenshot = sct.grab(sct.monitors[0])
                 image = np.array(screenshot)
-                data['display_capture'] = image
+                data['display_capture'].put(image)
             except Exception as e:
                 logger.error(f"Error in display capture: {e}")
                 time.sleep(1)
 
 
-def video_capture(data: Dict[str, Any], camera_id: int) -> None:
+def _capture_loop(
+        settings: Dict[str, Any],
+        camera_id: int,
+        is_playing: Callable[[], bool],
+        on_frame: Callable[[Optional[np.ndarray]], None],
+        stats: Dict[int, Dict[str, Any]],
+        wake: Any
+) -> None:
+    """
+    `on_frame` gets each captured frame, or None when a read fails. `wake` (a threading or
+    multiprocessing Event) is set when the camera settings change; only then are
+    settings['setup'] and settings['camera_enabled'] read again. While the camera is
+    disabled the loop sleeps on it.
+    """
     def setup() -> cv2.VideoCapture:
         cap = cv2.VideoCapture(camera_id)
-        settings = data['config']['camera'][camera_id]
         width, height = settings.get('width_height', [640, 480])
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
@@ -62,42 +143,173 @@ def video_capture(data: Dict[str, Any], camera_id: int) -> None:
         return cap
 
     cap = setup()
-    while data.get('play', False):
+    enabled = settings['camera_enabled']
+    frames = errors = 0
+    last_report = time.time()
+    last_status = None
+    while is_playing():
         try:
-            settings = data['config']['camera'][camera_id]
-            if settings['setup']:
-                settings['setup'] = False
-                cap.release()
-                cap = setup()
-            if settings['camera_enabled']:
+            if wake.is_set():  # settings may be a manager proxy; re-read it only when told to
+                wake.clear()
+                if settings['setup']:
+                    settings['setup'] = False
+                    cap.release()
+                    cap = setup()
+                enabled = settings['camera_enabled']
+            if enabled:
                 status, img = cap.read()
-                settings['status'] = status
-                settings['img'] = img
-                if not status:
+                if status != last_status:  # write only on change
+                    settings['status'] = last_status = status
+                if status:
+                    on_frame(img)
+                    frames += 1
+                else:
+                    on_frame(None)
+                    errors += 1
                     logger.warning(f"Failed to capture image from camera {camera_id}")
                     time.sleep(1)
                     cap.release()
                     cap = setup()
+            else:
+                wake.wait(1.0)  # timeout: notice `is_playing` going False
         except Exception as e:
+            errors += 1
             logger.error(f"Error in video capture for camera {camera_id}: {e}")
             time.sleep(1)
+        now = time.time()
+        if now - last_report >= 1.0:
+            stats[camera_id] = {
+                'capture_fps': frames / (now - last_report),
+                'errors': errors,
+                'width_height': settings.get('width_height_from_cap'),
+            }
+            frames = 0
+            last_report = now
     cap.release()
 
 
-def get_data(
-        data: Dict[str, Any],
-        source: str,
+def video_capture(data: Dict[str, Any], camera_id: int) -> None:
+    settings = data['config']['camera'][camera_id]
+    _capture_loop(
+        settings, camera_id, lambda: data.get('play', False), settings['slot'].put, data['stats'], data['wake'][camera_id]
+    )
+
+
+def shm_name(port: int, camera_id: int) -> str:
+    return f"hexss_camera_server_{port}_{camera_id}"
+
+
+def camera_process(
         camera_id: int,
-        quality: int = 100,
-        crosshairs: list | None = None
-) -> np.ndarray:
-    if crosshairs is None:
-        crosshairs = []  # [{"type": "circle", "center": [500, 500], "radius": 100, "color": [255, 0, 0], "thickness": 2}]
+        settings: Dict[str, Any],
+        stats: Dict[int, Dict[str, Any]],
+        play: multiprocessing.Event,
+        base: str,
+        wake: multiprocessing.Event,
+        signal: FrameSignal
+) -> None:
+    """
+    Capture loop of one camera in its own process (multiprocess mode). Frames go to the
+    shared-memory ring `base` (see hexss.frame_publisher.shm) and are announced on `signal`;
+    `settings` and `stats` are manager dicts shared with the web process. The current
+    segment name is published in settings['shm_segment'], since a frame larger than the
+    ring moves it to a new one.
+    """
+    width, height = settings.get('width_height', [640, 480])
+    writer = ShmRingWriter(base, slots=4, capacity=int(width) * int(height) * 3)
+    settings['shm_segment'] = writer.name
+
+    def on_frame(img: Optional[np.ndarray]) -> None:
+        if img is None:
+            if signal.ok:
+                signal.publish(signal.seq, False)
+            return
+        seq, resized = writer.write(img)
+        if resized:
+            settings['shm_segment'] = writer.name
+        signal.publish(seq, True)
+
+    try:
+        _capture_loop(settings, camera_id, lambda: not play.is_set(), on_frame, stats, wake)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+
+
+_local = threading.local()
+
+
+def _shm_frame(data: Dict[str, Any], camera_id: int, copy: bool = False):
+    """
+    (reader, seq, ts, pixels) of the latest frame of camera `camera_id` in multiprocess mode,
+    or None if it has not produced one yet. One reader per thread. Unless `copy`, the pixels
+    are a view that is only valid while `reader.valid(seq)`.
+    """
+    readers = getattr(_local, 'readers', None)
+    if readers is None:
+        readers = _local.readers = {}
+    reader: Optional[ShmRingReader] = readers.get(camera_id)
+    try:
+        if reader is None:
+            segment = data['config']['camera'][camera_id].get('shm_segment')
+            if segment is None:
+                return None
+            reader = readers[camera_id] = ShmRingReader(segment)
+        got = reader.read(copy=copy, new_only=False)
+    except (FileNotFoundError, ValueError):  # camera process not started (or restarted)
+        if reader is not None:
+            reader.close()
+        readers.pop(camera_id, None)
+        return None
+    return None if got is None else (reader, *got)
+
+
+_metrics_lock = threading.Lock()
+
+
+def _metrics(data: Dict[str, Any], camera_id: int) -> Dict[str, Any]:
+    return data['metrics'].setdefault(camera_id, {'encoded': 0, 'served': 0, 'latency_ms': 0.0, 'encode_ms': 0.0})
+
+
+def _update_metrics(data: Dict[str, Any], camera_id: int, latency: float, encode_time: float) -> None:
+    a = 0.1
+    with _metrics_lock:
+        m = _metrics(data, camera_id)
+        m['encoded'] += 1
+        m['latency_ms'] += a * (latency * 1000 - m['latency_ms'])
+        m['encode_ms'] += a * (encode_time * 1000 - m['encode_ms'])
+
+
+def _count_served(data: Dict[str, Any], source: str, camera_id: int) -> None:
+    if source == 'video_capture':
+        with _metrics_lock:
+            _metrics(data, camera_id)['served'] += 1
+
+
+def _get_frame(data: Dict[str, Any], source: str, camera_id: int, copy: bool):
+    """
+    (frame, shm, captured_at) for `get_data`: `shm` is the `_shm_frame` result the frame
+    is a view of (None otherwise), `captured_at` the time.monotonic() of the capture (None
+    for placeholders and the display).
+    """
+    shm = None
+    captured_at = None
     if source == 'video_capture':
         settings = data['config']['camera'][camera_id]
-        frame = settings.get('img')
-        status = settings.get('status')
+        if 'shm' in data:
+            shm = _shm_frame(data, camera_id, copy)
+            frame = None if shm is None else shm[3]
+            status = frame is not None and data['signals'][camera_id].ok
+            if status:  # the ring stamps frames with time.time()
+                captured_at = time.monotonic() - (time.time() - shm[2])
+            if copy:
+                shm = None
+        else:
+            _, captured_at, frame = settings['slot'].get()
+            status = frame is not None
         if not status or frame is None:
+            captured_at = None
             w, h = settings.get('width_height', [640, 480])
             if w == 0 or h == 0:
                 w, h = 640, 480
@@ -106,19 +318,125 @@ def get_data(
             cv2.putText(frame, f'from camera {camera_id}', (100, 190), 1, 2, (0, 0, 255), 2)
             cv2.putText(frame, datetime.now().strftime('%Y-%m-%d  %H:%M:%S'), (100, 230), 1, 2, (0, 0, 255), 2)
     else:  # source == 'display_capture':
-        frame = data.get('display_capture')
+        _, _, frame = data['display_capture'].get()
         if frame is None:
             frame = np.full((480, 640, 3), (50, 50, 50), dtype=np.uint8)
-    for crosshair in crosshairs:
-        if crosshair['type'] == 'line':
-            cv2.line(frame, crosshair['pt1'], crosshair['pt2'], crosshair['color'], crosshair['thickness'])
-        elif crosshair['type'] == 'circle':
-            cv2.circle(frame, crosshair['center'], crosshair['radius'], crosshair['color'], crosshair['thickness'])
-        elif crosshair['type'] == 'rectangle':
-            cv2.rectangle(frame, crosshair['pt1'], crosshair['pt2'], crosshair['color'], crosshair['thickness'])
+    return frame, shm, captured_at
+
+
+def get_data(
+        data: Dict[str, Any],
+        source: str,
+        camera_id: int,
+        quality: int = 100,
+        crosshairs: list | None = None,
+        attempts: int = 3
+) -> np.ndarray:
+    if crosshairs is None:
+        crosshairs = []  # [{"type": "circle", "center": [500, 500], "radius": 100, "color": [255, 0, 0], "thickness": 2}]
     encode_param = [cv2.IMWRITE_JPEG_QUALITY, quality]
-    ret, buffer = cv2.imencode('.jpg', frame, encode_param)
-    return buffer
+    for attempt in range(attempts):
+        # encode straight from the ring; the last attempt copies the frame out so it cannot tear
+        frame, shm, captured_at = _get_frame(data, source, camera_id, copy=attempt == attempts - 1)
+        if crosshairs:  # the frame is shared with other readers (and may be the shm ring)
+            frame = frame.copy()
+        for crosshair in crosshairs:
+            if crosshair['type'] == 'line':
+                cv2.line(frame, crosshair['pt1'], crosshair['pt2'], crosshair['color'], crosshair['thickness'])
+            elif crosshair['type'] == 'circle':
+                cv2.circle(frame, crosshair['center'], crosshair['radius'], crosshair['color'], crosshair['thickness'])
+            elif crosshair['type'] == 'rectangle':
+                cv2.rectangle(frame, crosshair['pt1'], crosshair['pt2'], crosshair['color'], crosshair['thickness'])
+        t0 = time.perf_counter()
+        ret, buffer = cv2.imencode('.jpg', frame, encode_param)
+        del frame
+        if shm is not None:
+            reader, seq = shm[0], shm[1]
+            del shm
+            if not reader.valid(seq):  # overwritten while encoding; take the next frame
+                continue
+        if captured_at is not None:
+            _update_metrics(data, camera_id, time.monotonic() - captured_at, time.perf_counter() - t0)
+        return buffer
+
+
+def _wait_frame(data: Dict[str, Any], source: str, camera_id: int, seq: int, timeout: float) -> Tuple[int, bool]:
+    """
+    (seq, has_frame) of the frame `get_data` would encode now, once seq differs from `seq`
+    (or after `timeout`).
+    """
+    if source == 'video_capture' and 'shm' in data:
+        current, ok = data['signals'][camera_id].wait_newer(seq, timeout)
+        return current, current != 0 and ok
+    if source == 'video_capture':
+        slot = data['config']['camera'][camera_id]['slot']
+    else:
+        slot = data['display_capture']
+    current, _, frame = slot.wait_newer(seq, timeout)
+    return current, frame is not None
+
+
+class _Broadcaster:
+    """
+    Encodes each new frame of one (source, camera, quality, crosshairs) once and hands the
+    JPEG to all its clients. Clients wait on `cond` for a seq newer than the one they sent
+    last, so a slow client skips frames instead of queueing them. The thread stops after
+    `idle_timeout` seconds without clients.
+    """
+    idle_timeout = 5.0
+    placeholder_interval = 1.0  # re-encode the "failed to capture" frame (it shows the time)
+
+    def __init__(self, data: Dict[str, Any], source: str, camera_id: int, quality: int, crosshairs: list) -> None:
+        self.data = data
+        self.source = source
+        self.camera_id = camera_id
+        self.quality = quality
+        self.crosshairs = crosshairs
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.jpeg: Optional[bytes] = None
+        self.alive = True
+        self.last_used = time.monotonic()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self) -> None:
+        frame_seq = -1
+        try:
+            while self.data.get('play', False) and time.monotonic() - self.last_used < self.idle_timeout:
+                seq, has_frame = _wait_frame(self.data, self.source, self.camera_id, frame_seq, self.placeholder_interval)
+                if seq == frame_seq and has_frame:
+                    continue
+                frame_seq = seq
+                jpeg = get_data(self.data, self.source, self.camera_id, self.quality, self.crosshairs).tobytes()
+                with self.cond:
+                    self.seq += 1
+                    self.jpeg = jpeg
+                    self.cond.notify_all()
+        finally:
+            with self.cond:
+                self.alive = False
+                self.cond.notify_all()
+
+    def wait(self, seq: int, timeout: float = 1.0) -> tuple[int, Optional[bytes]]:
+        """(seq, jpeg) of the latest frame once it is newer than `seq`, or the current one after `timeout`."""
+        self.last_used = time.monotonic()
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > seq or not self.alive, timeout)
+            return self.seq, self.jpeg
+
+
+_broadcasters: Dict[tuple, _Broadcaster] = {}
+_broadcasters_lock = threading.Lock()
+
+
+def get_broadcaster(data: Dict[str, Any], source: str, camera_id: int, quality: int, crosshairs: list) -> _Broadcaster:
+    key = (source, camera_id, quality, json.dumps(crosshairs, sort_keys=True))
+    with _broadcasters_lock:
+        b = _broadcasters.get(key)
+        if b is None or not b.alive:
+            b = _broadcasters[key] = _Broadcaster(data, source, camera_id, quality, crosshairs)
+        b.last_used = time.monotonic()
+        return b
 
 
 @app.route('/')
@@ -150,6 +468,7 @@ def update_cameras():
             config = load_config('camera_server')
             config['camera'][camera_id]['width_height'] = [int(width), int(height)]
             update_config('camera_server', config)
+        data['wake'][camera_id].set()  # after all settings are written; the loop re-reads them once
     return redirect(url_for('index'))
 
 
@@ -158,8 +477,13 @@ def get_image():
     source = request.args.get('source', default='display_capture', type=str)  # display_capture, video_capture,
     camera_id = request.args.get('id', default=0, type=int)  # 1, 2, ...
     quality = request.args.get('quality', default=100, type=int)
-    buffer = get_data(current_app.config['data'], source, camera_id, quality)
-    return Response(buffer.tobytes(), mimetype='image/jpeg')
+    data = current_app.config['data']
+    # a new broadcaster encodes its first frame right away; only fall back if that stalls
+    seq, jpeg = get_broadcaster(data, source, camera_id, quality, []).wait(0, timeout=0.5)
+    if jpeg is None:
+        jpeg = get_data(data, source, camera_id, quality).tobytes()
+    _count_served(data, source, camera_id)
+    return Response(jpeg, mimetype='image/jpeg')
 
 
 @app.route('/video')
@@ -168,7 +492,7 @@ def get_video():
     source = request.args.get('source', default='display_capture', type=str)
     camera_id = request.args.get('id', default=0, type=int)
     quality = request.args.get('quality', default=30, type=int)
-    sleep = request.args.get('sleep', default=0.05, type=float)
+    sleep = request.args.get('sleep', default=0.05, type=float)  # minimum interval between frames
     crosshairs = request.args.get('crosshairs', default='', type=str)
     try:
         crosshairs = json.loads(crosshairs)
@@ -176,16 +500,45 @@ def get_video():
         crosshairs = []
 
     def generate():
+        broadcaster = get_broadcaster(data, source, camera_id, quality, crosshairs)
+        seq = 0
+        last_sent = 0.0
         while data.get('play', False):
-            buffer = get_data(data, source, camera_id, quality, crosshairs)
-            frame = buffer.tobytes()
+            if not broadcaster.alive:
+                broadcaster = get_broadcaster(data, source, camera_id, quality, crosshairs)
+                seq = 0
+            new_seq, frame = broadcaster.wait(seq)
+            if new_seq == seq or frame is None:
+                continue
+            seq = new_seq
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            time.sleep(sleep)
+            _count_served(data, source, camera_id)
+            wait = sleep - (time.monotonic() - last_sent)
+            if wait > 0:
+                time.sleep(wait)
+            last_sent = time.monotonic()
 
     return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
+@app.route('/metrics')
+def get_metrics():
+    """
+    Per camera: capture fps and errors (capture side); frames encoded, frames delivered to
+    clients (`served`), capture-to-encode latency and encode time (web side).
+    """
+    data = current_app.config['data']
+    metrics = {}
+    for camera_id in range(len(data['config']['camera'])):
+        with _metrics_lock:
+            metrics[camera_id] = {
+                **data['stats'].get(camera_id, {}),
+                **data['metrics'].get(camera_id, {}),
+            }
+    return current_app.response_class(json.dumps(metrics), mimetype='application/json')
+
+
 def run_server(data: Dict[str, Any]) -> None:
     logging.getLogger('werkzeug').setLevel(logging.ERROR)
     app.config['data'] = data
@@ -199,30 +552,69 @@ def run_server(data: Dict[str, Any]) -> None:
     app.run(host=ipv4, port=port, debug=False, use_reloader=False)
 
 
-def run():
+def run(multiprocess: Optional[bool] = None):
+    """
+    `multiprocess` (default: config "multiprocess") captures each camera in its own process
+    and hands frames to the web server through shared memory; otherwise cameras are threads.
+    """
     config = load_config('camera_server', {
         "ipv4": '0.0.0.0',
         "port": 2002,
-        "camera": [{"width_height": [640, 480]}]
+        "camera": [{"width_height": [640, 480]}],
+        "multiprocess": False
     })
+    if multiprocess is None:
+        multiprocess = config.get('multiprocess', False)
     close_port(config['ipv4'], config['port'], verbose=False)
     data: Dict[str, Any] = {
         'play': True,
         'config': config,
-        'display_capture': np.full((480, 640, 3), (50, 50, 50), dtype=np.uint8)
+        'display_capture': FrameSlot(np.full((480, 640, 3), (50, 50, 50), dtype=np.uint8)),
+        'stats': {},
+        'metrics': {},
+        'wake': {},
     }
 
     m = Multithread()
+    processes: List[multiprocessing.Process] = []
+    manager = None
+    stop = None
     for camera_id, cam in enumerate(data['config']['camera']):
         cam.setdefault('status', False)
-        cam.setdefault('img', None)
         cam.setdefault('camera_enabled', True)
         cam.setdefault('width_height_from_cap', [None, None])
         cam.setdefault('setup', False)
-        m.add_func(video_capture, args=(data, camera_id))
+        if not multiprocess:
+            cam['slot'] = FrameSlot()
+            data['wake'][camera_id] = threading.Event()
+            m.add_func(video_capture, args=(data, camera_id))
+    if multiprocess:
+        manager = multiprocessing.Manager()
+        stop = multiprocessing.Event()
+        data['stats'] = manager.dict()
+        data['shm'] = {}
+        data['signals'] = {}
+        cameras = []
+        for camera_id, cam in enumerate(data['config']['camera']):
+            cameras.append(manager.dict(cam))
+            data['shm'][camera_id] = shm_name(config['port'], camera_id)
+            data['wake'][camera_id] = multiprocessing.Event()
+            data['signals'][camera_id] = FrameSignal()
+            p = multiprocessing.Process(
+                target=camera_process,
+                args=(
+                    camera_id, cameras[-1], data['stats'], stop, data['shm'][camera_id],
+                    data['wake'][camera_id], data['signals'][camera_id]
+                ),
+                daemon=True
+            )
+            processes.append(p)
+        data['config'] = {**config, 'camera': cameras}
     m.add_func(display_capture, args=(data,))
     m.add_func(run_server, args=(data,), join=False)
 
+    for p in processes:
+        p.start()
     m.start()
     try:
         while data['play']:
@@ -231,7 +623,13 @@ def run():
         print("\nShutting down...")
     finally:
         data['play'] = False
+        if stop is not None:
+            stop.set()
+        for p in processes:
+            p.join(timeout=5)
         m.join()
+        if manager is not None:
+            manager.shutdown()
 
 
 if __name__ == "__main__":
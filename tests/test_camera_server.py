@@ -0,0 +1,106 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip('flask')
+cv2 = pytest.importorskip('cv2')
+
+from hexss.server import camera_server
+from hexss.server.camera_server import FrameSlot, _Broadcaster, _capture_loop
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full((8, 8, 3), value, dtype=np.uint8)
+
+
+def test_frame_slot_wait_newer():
+    slot = FrameSlot()
+    assert slot.seq == 0
+    threading.Timer(0.05, slot.put, args=(frame(1),)).start()
+    seq, _, got = slot.wait_newer(0, timeout=2.0)
+    assert seq == 1 and (got == 1).all()
+
+
+def test_frame_slot_wait_newer_timeout():
+    slot = FrameSlot()
+    slot.put(frame(1))
+    t0 = time.monotonic()
+    seq, _, got = slot.wait_newer(1, timeout=0.05)  # nothing newer is put
+    assert time.monotonic() - t0 >= 0.05
+    assert seq == 1 and (got == 1).all()
+
+
+class FakeCap:
+    opened = 0
+
+    def __init__(self, camera_id):
+        FakeCap.opened += 1
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        return 8
+
+    def read(self):
+        return True, frame(1)
+
+    def release(self):
+        pass
+
+
+def test_disabled_camera_wakes_on_settings_change(monkeypatch):
+    monkeypatch.setattr(camera_server.cv2, 'VideoCapture', FakeCap)
+    settings = {'setup': False, 'camera_enabled': False}
+    playing = threading.Event()
+    playing.set()
+    wake = threading.Event()
+    slot = FrameSlot()
+    thread = threading.Thread(
+        target=_capture_loop, args=(settings, 0, playing.is_set, slot.put, {}, wake), daemon=True
+    )
+    thread.start()
+    try:
+        assert slot.wait_newer(0, timeout=0.1)[0] == 0  # disabled: no frames
+
+        settings['camera_enabled'] = True  # not picked up until `wake` is set
+        assert slot.wait_newer(0, timeout=0.1)[0] == 0
+
+        opened = FakeCap.opened
+        settings['setup'] = True
+        wake.set()
+        assert slot.wait_newer(0, timeout=2.0)[0] > 0
+        assert FakeCap.opened == opened + 1  # re-opened for the new setup
+        assert not wake.is_set() and not settings['setup']
+    finally:
+        playing.clear()
+        wake.set()
+        thread.join(2.0)
+    assert not thread.is_alive()
+
+
+def test_broadcaster_skips_frames_for_slow_clients():
+    data = {'play': True, 'display_capture': FrameSlot(frame(0)), 'config': {'camera': []}, 'metrics': {}}
+    broadcaster = _Broadcaster(data, 'display_capture', 0, 100, [])
+    try:
+        seq, jpeg = broadcaster.wait(0, timeout=2.0)
+        assert jpeg is not None
+
+        values = range(20, 220, 20)  # a burst of 10 frames the client is too slow to take
+        for value in values:
+            data['display_capture'].put(frame(value))
+
+        received = []
+        deadline = time.monotonic() + 5.0
+        while time.monotonic() < deadline:
+            seq, jpeg = broadcaster.wait(seq, timeout=1.0)
+            value = int(cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR).mean().round())
+            received.append(value)
+            if abs(value - values[-1]) <= 2:
+                break
+        assert abs(received[-1] - values[-1]) <= 2  # ends on the latest frame
+        assert len(received) < len(values)  # without getting every frame of the burst
+    finally:
+        data['play'] = False
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('ultralytics')
+
+from hexss.image import Image
+from hexss.image.detector import Detector, Detections, _nms
+
+
+def test_draw_boxes_draws_detections():
+    detector = Detector.__new__(Detector)  # no model needed to draw
+    detector.detections = Detections(
+        cls=[0, 1],
+        conf=[0.9, 0.5],
+        xyxy=[[10, 10, 50, 50], [60, 20, 90, 70]],
+        size=(100, 80),
+        class_names=['a', 'b']
+    )
+    frame = np.zeros((80, 100, 3), dtype=np.uint8)
+
+    drawn = detector.draw_boxes(Image(frame), thickness=2, font_size=10)
+
+    pixels = np.asarray(drawn.image)
+    assert pixels.shape[:2] == (80, 100)
+    assert pixels[30, 10].any()  # left edge of the first box
+    assert not frame.any()  # the source frame is untouched
+
+
+def test_nms_is_class_aware_with_negative_coordinates():
+    xyxy = np.array([[-10, -10, 5, 5], [-9, -9, 5, 5]], dtype=float)
+    scores = np.array([0.9, 0.8])
+    assert list(_nms(xyxy, scores, np.array([0, 1]), 0.1)) == [0, 1]  # different classes
+    assert list(_nms(xyxy, scores, np.array([0, 0]), 0.1)) == [0]
@@ -0,0 +1,97 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from hexss.frame_publisher.shm import ShmRingReader, ShmRingWriter, segment_name
+
+
+@pytest.fixture
+def writer():
+    w = ShmRingWriter(f"hxtest{uuid.uuid4().hex[:8]}", slots=3, capacity=8 * 8 * 3)
+    yield w
+    w.close()
+
+
+def frame(value: int, shape=(8, 8, 3)) -> np.ndarray:
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_write_then_read(writer):
+    reader = ShmRingReader(writer.name)
+    try:
+        assert reader.read() is None  # nothing written yet
+        seq, _ = writer.write(frame(7))
+        got_seq, ts, pixels = reader.read()
+        assert got_seq == seq == 1
+        assert ts > 0
+        assert pixels.shape == (8, 8, 3)
+        assert (pixels == 7).all()
+    finally:
+        reader.close()
+
+
+def test_new_only(writer):
+    reader = ShmRingReader(writer.name)
+    try:
+        writer.write(frame(1))
+        assert reader.read() is not None
+        assert reader.read() is None  # same seq again
+        seq, _, pixels = reader.read(new_only=False)
+        assert seq == 1 and (pixels == 1).all()
+        writer.write(frame(2))
+        writer.write(frame(3))
+        seq, _, pixels = reader.read()
+        assert seq == 3 and (pixels == 3).all()  # only the latest frame
+    finally:
+        reader.close()
+
+
+def test_resize_moves_to_next_generation(writer):
+    reader = ShmRingReader(writer.name)
+    try:
+        writer.write(frame(1))
+        reader.read()
+        _, resized = writer.write(frame(9, (16, 16, 3)))
+        assert resized
+        assert writer.name == segment_name(writer.base, 1)
+        seq, _, pixels = reader.read()  # follows next_generation of the old segment
+        assert reader.generation == 1
+        assert seq == 2
+        assert pixels.shape == (16, 16, 3) and (pixels == 9).all()
+        with pytest.raises(FileNotFoundError):  # the old segment is unlinked
+            ShmRingReader(segment_name(writer.base, 0))
+    finally:
+        reader.close()
+
+
+def test_gray_frame(writer):
+    reader = ShmRingReader(writer.name)
+    try:
+        writer.write(frame(5, (4, 6)))
+        _, _, pixels = reader.read()
+        assert pixels.shape == (4, 6)
+        assert (pixels == 5).all()
+    finally:
+        reader.close()
+
+
+def test_view_invalid_after_overwrite(writer):
+    reader = ShmRingReader(writer.name)
+    try:
+        writer.write(frame(1))
+        seq, _, view = reader.read(copy=False)
+        assert reader.valid(seq)
+        assert (view == 1).all()
+        for value in range(2, 2 + writer.slots):  # wrap around to the same slot
+            writer.write(frame(value))
+        assert not reader.valid(seq)
+        del view
+    finally:
+        reader.close()
+
+
+def test_reader_does_not_unlink_segment(writer):
+    ShmRingReader(writer.name).close()
+    reader = ShmRingReader(writer.name)  # still attachable after another reader went away
+    reader.close()